@@ -5,9 +5,15 @@ import time
 import datetime
 from google import genai
 from google.genai import types
+from DebugCapture import DebugCapture
 
 class AIProcessor:
-    def __init__(self, ai_config=None):
+    def __init__(self, ai_config=None, server_folder=None):
+        """
+        Args:
+            ai_config: Configuration with API keys and model (required)
+            server_folder: Folder for per-request debug captures; None keeps them in memory only
+        """
         if ai_config is None:
             raise ValueError("AI config is required. Please provide a valid configuration with API keys.")
         
@@ -23,9 +29,17 @@ class AIProcessor:
         self.cooldown_24_hour_completed = False
         self.quota_error_count = 0
         
-        # Debug logging
-        self.debug_log_file = "debug_logs.json"
-        self.debug_logs = []
+        # Debug capture of every attempt, kept in a ring buffer and written per request
+        debug_config = self.ai_config.get("debug_capture", {})
+        self.debug_capture = DebugCapture(
+            server_folder,
+            capacity=debug_config.get("capacity", 50),
+            sample_rate=debug_config.get("sample_rate", 0.0),
+            persist_failures=debug_config.get("persist_failures", True)
+        )
+        self.current_request_id = None
+        # Attempts made by the current or last process_ai_request call
+        self.attempt_count = 0
 
     def _log_debug(self, attempt, prompt, response_text, response_dict, error=None):
         """Log debug information for AI responses"""
@@ -41,18 +55,8 @@ class AIProcessor:
             "success": error is None
         }
         
-        self.debug_logs.append(debug_entry)
-        
-        # Keep only last 50 entries
-        if len(self.debug_logs) > 50:
-            self.debug_logs = self.debug_logs[-50:]
-        
-        # Save to file
-        try:
-            with open(self.debug_log_file, 'w') as f:
-                json.dump(self.debug_logs, f, indent=2)
-        except Exception as e:
-            print(f"Error saving debug logs: {e}")
+        self.attempt_count += 1
+        self.debug_capture.record(self.current_request_id, debug_entry)
 
     def _switch_to_next_api_key(self):
         """Switch to the next available API key"""
@@ -188,11 +192,29 @@ class AIProcessor:
             print(f"Error checking for overlaps: {e}")
             return True  # Assume overlap if we can't check
 
-    def process_ai_request(self, prompt, courses=None):
+    def process_ai_request(self, prompt, courses=None, request_id=None):
         """
         Process AI request using the client format from test.py and app[old].py
         Returns structured JSON response with class schedule data
+        
+        Args:
+            prompt: Prompt describing the courses, sections and preferences
+            courses: Requested courses, used to validate the schedule
+            request_id: Id of the request being processed, used to group debug captures
         """
+        self.current_request_id = request_id
+        self.attempt_count = 0
+        result = None
+        try:
+            result = self._process_ai_request(prompt, courses)
+            return result
+        finally:
+            self.current_request_id = None
+            success = isinstance(result, dict) and not result.get("error")
+            self.debug_capture.finish(request_id, success)
+
+    def _process_ai_request(self, prompt, courses=None):
+        """Run the AI request with retries, API key rotation and model fallback"""
         ai_start_time = time.time()
         
         # Check if we should wait for cooldown
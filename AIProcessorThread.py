@@ -1,11 +1,9 @@
 import threading
 import time
-import queue
-import os
-import json
-from datetime import datetime, timezone
+from uuid import UUID
 from AIProcessor import AIProcessor
 from AIResponse import AIResponse
+from JobQueue import JobLeaseKeeper
 
 class AIProcessorThread:
     def __init__(self, waitlist, ai_config=None):
@@ -20,41 +18,29 @@ class AIProcessorThread:
             raise ValueError("AI config is required for AIProcessorThread")
             
         self.waitlist = waitlist
-        self.ai_processor = AIProcessor(ai_config)
-        self.processing_queue = queue.Queue()
+        self.ai_processor = AIProcessor(ai_config, waitlist.server_folder)
         self.thread = None
         self.running = False
-        self.monitor_interval = 2  # Check for status changes every 2 seconds
+        # Requests of this process are enqueued the moment they are ready; this fallback
+        # interval covers jobs enqueued by other distributed workers, and nack delays
+        self.monitor_interval = waitlist.config.get("idle_check_seconds", 5)
+        self._wake = threading.Event()
         self.server_folder = waitlist.server_folder
+        
+        # Durable job queue, shared with other machines when the waitlist is distributed
+        self.job_queue = waitlist.job_queue
+        self.distributed = waitlist.distributed
+        self.worker_id = waitlist.worker_id
+        self.job_lease_seconds = waitlist.config.get("job_lease_seconds", 120)
+        # Seconds before a job deferred by an AI quota cooldown is offered again
+        self.retry_delay = waitlist.config.get("job_retry_seconds", 60)
+        self._recovered = False
+        # Cooldown and activity as of the last loop iteration, read by status endpoints
+        self.state = {"on_waitlist": False, "on_cooldown": False, "processing": False}
     
     def log_event(self, event, data=None):
         """Log events to waitlist logs"""
-        log_entry = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "event": event,
-            "data": data or {}
-        }
-        
-        log_file = os.path.join(self.server_folder, "server_logs.json")
-        
-        # Load existing logs
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                logs = json.load(f)
-        else:
-            logs = []
-        
-        # Add new log entry
-        logs.append(log_entry)
-        
-        # Keep only last 1000 entries
-        if len(logs) > 1000:
-            logs = logs[-1000:]
-        
-        # Save logs
-        with open(log_file, 'w') as f:
-            json.dump(logs, f, indent=2)
-        
+        self.waitlist.event_log.log(event, data)
         print(f"Waitlist event logged: {event}")
         
     def start(self):
@@ -68,6 +54,7 @@ class AIProcessorThread:
     def stop(self):
         """Stop the AI processor thread"""
         self.running = False
+        self._wake.set()
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=5)
             print("AI Processor Thread stopped")
@@ -76,71 +63,138 @@ class AIProcessorThread:
         """Main thread loop that monitors status changes and processes requests"""
         while self.running:
             try:
-                # Check for status changes in the waitlist
-                self._check_status_changes()
+                # Requeue work that was in flight when this worker last stopped
+                if not self._recovered:
+                    self._recover_in_flight()
+                
+                # Requests made ready from here on set the event again
+                self._wake.clear()
                 
                 # Process items in the queue
                 self._process_queue()
+                self._refresh_state()
                 
-                # Sleep before next iteration
-                time.sleep(self.monitor_interval)
+                # Sleep until a request becomes ready, or until the fallback check is due
+                self._wake.wait(self.monitor_interval)
                 
             except Exception as e:
                 print(f"Error in AI Processor Thread: {e}")
                 time.sleep(self.monitor_interval)
     
-    def _check_status_changes(self):
-        """Check for requests that have changed status to courses_collected"""
+    def _recover_in_flight(self):
+        """Put requests interrupted mid-processing by a restart back on the queue"""
+        if not self.distributed:
+            # Other workers' jobs are recovered through lease expiry instead
+            requeued = self.job_queue.nack_owned(self.worker_id)
+            if requeued:
+                print(f"Requeued {requeued} AI jobs left in flight by the previous run")
+        # Requests without a job, e.g. ready before this thread started or from before the job queue
+        # existed; the interrupted ones go first, then the rest in the order they were submitted
+        responses = (self.waitlist.get_requests_in_stage("ai_processing") +
+                     self.waitlist.get_requests_in_stage("courses_collected"))
+        responses.sort(key=lambda r: (r.stage != "ai_processing", r.created_at))
+        for response in responses:
+            self._enqueue_job(response)
+        if self.distributed:
+            # Distributed workers do not hold other workers' requests, so look for jobless ones in the store;
+            # requests with a job, e.g. claimed by a live worker, keep it
+            for stage in ("ai_processing", "courses_collected"):
+                for request_id in self.waitlist.database.get_ids_by_stage(stage):
+                    self.job_queue.enqueue(request_id)
+        self._recovered = True
+    
+    def notify_stage_change(self, response):
+        """
+        Enqueue a request the moment its course extraction finishes and wake the thread
+        
+        Called by the waitlist on every update of a request, after it was saved,
+        from whichever thread made the change.
+        """
+        if not self.running or response.status.stage != "courses_collected":
+            return
         try:
-            for response in self.waitlist.waitlist:
-                if response.stage == "courses_collected" and not self._is_in_queue(response.id):
-                    # Add to processing queue
-                    self.processing_queue.put(response)
-                    self.log_event("ai_processing_queued", {
-                        "request_id": str(response.id),
-                        "email": response.email
-                    })
-                    print(f"Added request {response.id} to AI processing queue")
-                    
+            self._enqueue_job(response)
         except Exception as e:
-            print(f"Error checking status changes: {e}")
-            self.log_event("status_check_error", {"error": str(e)})
+            print(f"Error enqueuing request {response.id}: {e}")
+            self.log_event("status_check_error", {"request_id": str(response.id), "error": str(e)})
+        self._wake.set()
     
-    def _is_in_queue(self, request_id):
-        """Check if a request is already in the processing queue"""
-        try:
-            # Convert queue to list to check contents
-            queue_items = list(self.processing_queue.queue)
-            return any(item.id == request_id for item in queue_items)
-        except:
-            return False
+    def _enqueue_job(self, response):
+        """Add a request to the durable job queue unless it already has a job"""
+        if self.distributed:
+            # The claiming worker loads the request from the shared store, so it must be written first
+            self.waitlist.flush()
+        if self.job_queue.enqueue(response.id):
+            self.log_event("ai_processing_queued", {
+                "request_id": str(response.id),
+                "email": response.email
+            })
+            print(f"Added request {response.id} to AI job queue")
+        if self.distributed:
+            # Whichever worker claims the job owns the request from here on
+            self.waitlist.release_request(response)
+    
+    def _update_waitlist_mode(self):
+        """Sync the waitlist's on_waitlist flag with the cooldown state; returns True on cooldown"""
+        if self._is_on_cooldown():
+            if not self.waitlist.on_waitlist:
+                self.waitlist.on_waitlist = True
+                print("AI Processor on cooldown - setting on_waitlist to True")
+            self._refresh_state()
+            return True
+        if self.waitlist.on_waitlist:
+            self.waitlist.on_waitlist = False
+            print("AI Processor cooldown ended - setting on_waitlist to False")
+        self._refresh_state()
+        return False
+    
+    def _refresh_state(self):
+        """Recompute self.state and publish it to processes sharing the store when it changed"""
+        state = {
+            "on_waitlist": self.waitlist.on_waitlist,
+            "on_cooldown": self._is_on_cooldown(),
+            "processing": self.is_processing()
+        }
+        if state != self.state:
+            self.state = state
+            self.waitlist.publish_processor_state(state)
     
     def _process_queue(self):
-        """Process items in the queue one by one"""
+        """Claim jobs from the job queue and process them one by one while holding their lease"""
         try:
-            while not self.processing_queue.empty() and self.running:
-                # Check if AI processor is on cooldown
-                if self._is_on_cooldown():
-                    if not self.waitlist.on_waitlist:
-                        self.waitlist.on_waitlist = True
-                        print("AI Processor on cooldown - setting on_waitlist to True")
+            while self.running:
+                if self._update_waitlist_mode():
                     break
-                else:
-                    if self.waitlist.on_waitlist:
-                        self.waitlist.on_waitlist = False
-                        print("AI Processor cooldown ended - setting on_waitlist to False")
                 
-                # Get next item from queue
-                try:
-                    response = self.processing_queue.get_nowait()
-                except queue.Empty:
+                request_id = self.job_queue.claim(self.worker_id, self.job_lease_seconds)
+                if request_id is None:
                     break
                 
-                # Process the request
-                self._process_single_request(response)
+                response = self.waitlist.load_request(UUID(request_id))
+                if response is None:
+                    # Never drop a job over a request this process cannot see; hand it back instead
+                    self.job_queue.nack(request_id, self.worker_id, self.retry_delay)
+                    print(f"Request {request_id} for AI job not found - returned the job to the queue")
+                    continue
+                # Requests already finished (e.g. by a worker whose lease expired mid-run) need no work
+                if response.stage not in ("courses_collected", "ai_processing"):
+                    self.job_queue.ack(request_id, self.worker_id)
+                    continue
+                
+                with JobLeaseKeeper(self.job_queue, request_id, self.worker_id, self.job_lease_seconds) as lease:
+                    done = self._process_single_request(response, lease)
+                if lease.lost:
+                    # Another worker took the job over; it acks the job and owns the request now
+                    if self.distributed:
+                        self.waitlist.release_request(response)
+                    continue
+                if done:
+                    self.job_queue.ack(request_id, self.worker_id)
+                else:
+                    self.job_queue.nack(request_id, self.worker_id, self.retry_delay)
                 
         except Exception as e:
-            print(f"Error processing queue: {e}")
+            print(f"Error processing job queue: {e}")
     
     def _is_on_cooldown(self):
         """Check if the AI processor is currently on cooldown"""
@@ -158,14 +212,22 @@ class AIProcessorThread:
         except:
             return False
     
-    def _process_single_request(self, response):
-        """Process a single request through the AI processor"""
+    def _process_single_request(self, response, lease=None):
+        """
+        Process a single request through the AI processor
+        
+        Args:
+            response: Request to process
+            lease: JobLeaseKeeper of the request's job; nothing is stored once its lease is lost
+        
+        Returns:
+            True if the request reached a final stage, False if it should be retried later
+        """
         try:
             print(f"Processing request {response.id} with AI")
             
-            # Update stage to processing
+            # Update stage to processing (the waitlist persists the change)
             response.update_stage("ai_processing")
-            self.waitlist.save()
             
             self.log_event("ai_processing_started", {
                 "request_id": str(response.id),
@@ -176,13 +238,35 @@ class AIProcessorThread:
             ai_prompt = self._build_ai_prompt(response)
             
             # Process with AI
-            ai_result = self.ai_processor.process_ai_request(ai_prompt, response.courses_requested)
+            ai_started = time.time()
+            ai_result = self.ai_processor.process_ai_request(ai_prompt, response.courses_requested,
+                                                             request_id=response.id)
             
-            # Store the AI response
-            response.set_ai_response(ai_result)
+            if lease is not None and lease.lost:
+                # The worker that took the job over writes the result; storing ours would race it
+                self.log_event("ai_processing_abandoned", {
+                    "request_id": str(response.id),
+                    "email": response.email
+                })
+                print(f"Abandoned request {response.id} after losing its job lease")
+                return False
+            
+            if isinstance(ai_result, dict) and ai_result.get("error") == "QUOTA_EXHAUSTED":
+                # Not the request's fault; put it back in line for after the cooldown
+                response.update_stage("courses_collected")
+                self.log_event("ai_processing_deferred", {
+                    "request_id": str(response.id),
+                    "email": response.email,
+                    "retry_in_seconds": self.retry_delay
+                })
+                print(f"Deferred request {response.id} until the AI quota cooldown ends")
+                return False
             
-            # Save the updated response
-            self.waitlist.save()
+            # Only after the quota check, since deferred runs would skew the completion estimates
+            self.waitlist.stats.record_ai(time.time() - ai_started, self.ai_processor.attempt_count)
+            
+            # Store the AI response (the waitlist persists the change)
+            response.set_ai_response(ai_result)
             
             self.log_event("ai_processing_completed", {
                 "request_id": str(response.id),
@@ -191,18 +275,21 @@ class AIProcessorThread:
             })
             
             print(f"Completed processing request {response.id}")
+            return True
             
         except Exception as e:
             print(f"Error processing request {response.id}: {e}")
+            if lease is not None and lease.lost:
+                return False
             # Update stage to processing_failed
             response.set_ai_error(str(e))
-            self.waitlist.save()
             
             self.log_event("ai_processing_failed", {
                 "request_id": str(response.id),
                 "email": response.email,
                 "error": str(e)
             })
+            return True
     
     def _build_ai_prompt(self, response):
         """Build the AI prompt using course data and preferences"""
@@ -346,11 +433,11 @@ class AIProcessorThread:
     
     def get_queue_size(self):
         """Get the current size of the processing queue"""
-        return self.processing_queue.qsize()
+        return self.job_queue.count("queued")
     
     def is_processing(self):
         """Check if the thread is currently processing requests"""
-        return self.running and (not self.processing_queue.empty() or self._is_on_cooldown())
+        return self.running and (self.job_queue.count() > 0 or self._is_on_cooldown())
     
     def get_status(self):
         """Get the current status of the AI processor thread"""
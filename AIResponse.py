@@ -1,13 +1,32 @@
 import threading
 import time
+import json
 import requests
+from collections import namedtuple
 from bs4 import BeautifulSoup
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+
+# Stands in for a lazily loaded field with no stored form pending, i.e. one already materialized
+_MATERIALIZED = object()
+
+# Immutable view of a request's progress, replaced as a whole on every change so
+# readers can take it without locking
+RequestStatus = namedtuple("RequestStatus", ["stage", "updated_at", "version"])
 
 
 class AIResponse:
-    def __init__(self, id, courses_requested, semester, preferences, email=None):
+    # Stages after which a request never changes again
+    TERMINAL_STAGES = ("done_processing", "ai_failed", "extraction_failed")
+    ACTIVE_STAGES = ("initiated", "extracting_courses", "courses_collected", "ai_processing")
+
+    def __init__(self, id, courses_requested, semester, preferences, email=None, on_update=None,
+                 timetable_store=None, start_extraction=True):
+        # Guards materialization and release of this request's lazily loaded fields
+        self._hydration_lock = threading.Lock()
+        self._pending = None
+        self.version = 0
+        self._serialized = None
         self.id = id
         self.courses_requested = courses_requested
         self.semester = semester
@@ -15,28 +34,165 @@ class AIResponse:
         self.preferences = preferences
         self.stage = "initiated"
         self.course_timetable = None
+        self.timetable_refs = {}
+        self.timetable_store = timetable_store
         self.ai_response = None
         self._extraction_thread = None
         self._extraction_error = None
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
+        self.on_update = on_update
+        # Stage transitions with UTC times, replaced as a whole on every change
+        self.timeline = []
+        self._publish_status()
 
         # Start course extraction asynchronously
-        self._start_course_extraction()
+        if start_extraction:
+            self.start_extraction(notify=False)
+
+    @property
+    def course_timetable(self):
+        """Course timetable DataFrames, built from the stored record on first access"""
+        if self._pending is not None:
+            self._hydrate("course_timetable")
+        return self._course_timetable
+
+    @course_timetable.setter
+    def course_timetable(self, value):
+        self._discard_pending("course_timetable")
+        self._course_timetable = value
+
+    @property
+    def ai_response(self):
+        """AI result, taken from the stored record on first access"""
+        if self._pending is not None:
+            self._hydrate("ai_response")
+        return self._ai_response
+
+    @ai_response.setter
+    def ai_response(self, value):
+        self._discard_pending("ai_response")
+        self._ai_response = value
+
+    def is_hydrated(self):
+        """Check whether the timetable and AI result have been materialized"""
+        return self._pending is None
+
+    def _hydrate(self, field):
+        """Materialize one lazily loaded field from its stored form"""
+        with self._hydration_lock:
+            if self._pending is None or field not in self._pending:
+                return
+            raw = self._pending[field]
+            if field == "course_timetable":
+                self._course_timetable = self._timetable_from_raw(raw)
+            else:
+                self._ai_response = raw
+            self._discard_pending(field)
+
+    def _discard_pending(self, field):
+        """Forget the stored form of a field once it has a live value"""
+        if self._pending is not None:
+            self._pending.pop(field, None)
+            if not self._pending:
+                self._pending = None
+
+    def release_timetable(self):
+        """
+        Drop the timetable DataFrames from memory, keeping only their store references
+
+        Tables without a reference yet are written to the TimetableStore first.
+        The timetable is loaded back from the store on next access.
+
+        Returns:
+            True if DataFrames were released
+        """
+        if self.timetable_store is None:
+            return False
+        with self._hydration_lock:
+            if self._pending is not None and "course_timetable" in self._pending:
+                return False
+            course_timetable = self._course_timetable
+            if not course_timetable:
+                return False
+
+            refs = dict(self.timetable_refs)
+            raw = {}
+            for course_code, df in list(course_timetable.items()):
+                if course_code not in refs and df is not None and not df.empty:
+                    cleaned = self._clean_course_frame(df).drop(columns=['Instructor'], errors='ignore')
+                    refs[course_code] = self.timetable_store.put(self.semester, course_code, cleaned)
+                raw[course_code] = {"ref": refs[course_code]} if course_code in refs else []
+            self.timetable_refs = refs
+
+            # Publish the stored form before dropping the frames so readers always find one of them
+            pending = dict(self._pending or {})
+            pending["course_timetable"] = raw
+            self._pending = pending
+            self._course_timetable = None
+        return True
+
+    def get_resident_frames(self):
+        """Get the timetable DataFrames currently held in memory, without loading any"""
+        pending = self._pending
+        if pending is not None and "course_timetable" in pending:
+            return []
+        return [df for df in list((self._course_timetable or {}).values()) if df is not None]
+
+    def get_serialized_size(self):
+        """Get the size of the cached JSON encoding, or 0 if none is cached"""
+        cached = self._serialized
+        return len(cached[1]) if cached is not None else 0
+
+    def _timetable_from_raw(self, course_timetable_data):
+        """Convert a serialized course timetable back to DataFrames"""
+        if not course_timetable_data:
+            return None
+
+        course_timetable = {}
+        for course_code, records in course_timetable_data.items():
+            if isinstance(records, dict) and "ref" in records:
+                self.timetable_refs[course_code] = records["ref"]
+                course_timetable[course_code] = (
+                    self.timetable_store.get(records["ref"]) if self.timetable_store else pd.DataFrame())
+            elif records and len(records) > 0:
+                df = pd.DataFrame(records)
+                if self.timetable_store is not None:
+                    # Move rows embedded by older versions into the shared store
+                    ref = self.timetable_store.put(self.semester, course_code, df)
+                    self.timetable_refs[course_code] = ref
+                    df = self.timetable_store.get(ref)
+                course_timetable[course_code] = df
+            else:
+                course_timetable[course_code] = pd.DataFrame()
+        return course_timetable
 
     def to_dict(self):
-        # Convert DataFrames to JSON-serializable format using cleaned data
-        course_timetable_serializable = {}
-        if self.course_timetable:
-            # Use cleaned data to avoid bloated/duplicate records
-            cleaned_data = self.get_clean_course_data()
-            for course_code, df in cleaned_data.items():
-                if df is not None and not df.empty:
-                    # Drop instructor column if present before serializing
-                    df_no_instructor = df.drop(columns=['Instructor'], errors='ignore')
-                    course_timetable_serializable[course_code] = df_no_instructor.to_dict('records')
-                else:
-                    course_timetable_serializable[course_code] = []
+        pending = self._pending or {}
+        raw_timetable = pending.get("course_timetable", _MATERIALIZED)
+
+        if raw_timetable is not _MATERIALIZED:
+            # Not materialized yet, so the stored form is still current
+            course_timetable_serializable = raw_timetable or {}
+        else:
+            # Convert DataFrames to JSON-serializable format using cleaned data
+            course_timetable_serializable = {}
+            course_timetable = self.course_timetable
+            if course_timetable:
+                for course_code, df in list(course_timetable.items()):
+                    ref = self.timetable_refs.get(course_code)
+                    if ref is not None:
+                        # Shared timetables are stored once in the TimetableStore
+                        course_timetable_serializable[course_code] = {"ref": ref}
+                    elif df is not None and not df.empty:
+                        # Use cleaned data to avoid bloated/duplicate records
+                        df_cleaned = self._clean_course_frame(df)
+                        if not df_cleaned.empty:
+                            # Drop instructor column if present before serializing
+                            df_no_instructor = df_cleaned.drop(columns=['Instructor'], errors='ignore')
+                            course_timetable_serializable[course_code] = df_no_instructor.to_dict('records')
+                        else:
+                            course_timetable_serializable[course_code] = []
 
         return {
             "id": str(self.id),
@@ -48,13 +204,33 @@ class AIResponse:
             "ai_response": self.ai_response,
             "preferences": self.preferences,
             "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "timeline": self.timeline
+        }
+
+    def to_summary(self):
+        """Get a compact description of the request without timetable or AI result"""
+        return {
+            "id": str(self.id),
+            "stage": self.status.stage,
+            "semester": self.semester,
+            "courses_requested": self.courses_requested,
+            "preferences": self.preferences,
+            "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat()
         }
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, timetable_store=None):
+        """
+        Build a lightweight AIResponse from a stored record
+
+        Only id, stage, timestamps and request details are set up front. The
+        timetable and AI result are kept in their stored form until first use.
+        """
         from uuid import UUID
         instance = cls.__new__(cls)
+        instance._hydration_lock = threading.Lock()
 
         id_value = data.get('id', None)
         # Handle both string and UUID object cases
@@ -67,35 +243,109 @@ class AIResponse:
         instance.email = data.get('email', None)
         instance.stage = data.get('stage', None)
 
-        # Convert serialized course timetable back to DataFrames
-        course_timetable_data = data.get('course_timetable', None)
-        if course_timetable_data:
-            instance.course_timetable = {}
-            for course_code, records in course_timetable_data.items():
-                if records and len(records) > 0:
-                    instance.course_timetable[course_code] = pd.DataFrame(
-                        records)
-                else:
-                    instance.course_timetable[course_code] = pd.DataFrame()
-        else:
-            instance.course_timetable = None
+        instance.version = 0
+        instance._serialized = None
+        instance.timetable_store = timetable_store
+        instance.timetable_refs = {}
+        instance._course_timetable = None
+        instance._ai_response = None
+        instance._pending = {
+            "course_timetable": data.get('course_timetable', None),
+            "ai_response": data.get('ai_response', None)
+        }
 
-        instance.ai_response = data.get('ai_response', None)
         instance.preferences = data.get('preferences', None)
-        instance.created_at = datetime.fromisoformat(
-            data.get('created_at', datetime.now().isoformat()))
-        instance.updated_at = datetime.fromisoformat(
-            data.get('updated_at', datetime.now().isoformat()))
+        created_at = data.get('created_at', None)
+        updated_at = data.get('updated_at', None)
+        instance.created_at = datetime.fromisoformat(created_at) if created_at else datetime.now()
+        instance.updated_at = datetime.fromisoformat(updated_at) if updated_at else datetime.now()
+        instance.timeline = cls.timeline_from_record(data)
 
         # Set other instance variables that would normally be set in __init__
         instance._extraction_thread = None
         instance._extraction_error = None
+        instance.on_update = None
+        instance._publish_status()
 
         return instance
 
-    def _start_course_extraction(self):
+    @staticmethod
+    def timeline_from_record(data):
+        """
+        Get the timeline of a stored record
+
+        Records stored before timelines were recorded get an approximate one
+        built from their creation time and their last update.
+        """
+        if data.get('timeline'):
+            return data['timeline']
+        created_at = data.get('created_at')
+        updated_at = data.get('updated_at')
+        created_at = datetime.fromisoformat(created_at) if created_at else datetime.now()
+        updated_at = datetime.fromisoformat(updated_at) if updated_at else created_at
+        timeline = [{"stage": "initiated", "time": created_at.astimezone(timezone.utc).isoformat()}]
+        stage = data.get('stage')
+        if stage and stage != "initiated":
+            timeline.append({"stage": stage, "time": updated_at.astimezone(timezone.utc).isoformat()})
+        return timeline
+
+    def to_json(self):
+        """
+        Get the JSON encoding of to_dict(), reusing the cached encoding while
+        the record has not changed since it was last serialized
+        """
+        cached = self._serialized
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        version = self.version
+        encoded = json.dumps(self.to_dict())
+        self._serialized = (version, encoded)
+        return encoded
+
+    def is_dirty(self):
+        """Check whether the record changed since its last serialization"""
+        cached = self._serialized
+        return cached is None or cached[0] != self.version
+
+    def get_stage_seconds(self, stage):
+        """Get the seconds spent in the latest visit to a stage, up to now if still in it, or None"""
+        return AIResponse.stage_seconds(self.timeline, stage)
+
+    @staticmethod
+    def stage_seconds(timeline, stage):
+        """Get the seconds a timeline spent in its latest visit to a stage, up to now if still in it, or None"""
+        for i in range(len(timeline) - 1, -1, -1):
+            if timeline[i]["stage"] == stage:
+                started = datetime.fromisoformat(timeline[i]["time"])
+                ended = (datetime.fromisoformat(timeline[i + 1]["time"]) if i + 1 < len(timeline)
+                         else datetime.now(timezone.utc))
+                return (ended - started).total_seconds()
+        return None
+
+    def _publish_status(self):
+        """Replace the status snapshot with one matching the current fields"""
+        if not self.timeline or self.timeline[-1]["stage"] != self.stage:
+            self.timeline = self.timeline + [
+                {"stage": self.stage, "time": datetime.now(timezone.utc).isoformat()}]
+        self.status = RequestStatus(self.stage, self.updated_at, self.version)
+
+    def _notify_update(self):
+        """Bump the version and let the owner (usually the WaitList) know this request changed"""
+        self.version += 1
+        self._publish_status()
+        if self.on_update:
+            try:
+                self.on_update(self)
+            except Exception as e:
+                print(f"Error notifying update for request {self.id}: {e}")
+
+    def start_extraction(self, notify=True):
         """Start the course extraction process in a separate thread"""
-        self.stage = "extracting_courses"
+        if notify:
+            self.update_stage("extracting_courses")
+        else:
+            self.stage = "extracting_courses"
+            self._publish_status()
         self._extraction_thread = threading.Thread(
             target=self._extract_courses_async)
         self._extraction_thread.daemon = True
@@ -104,7 +354,10 @@ class AIResponse:
     def _extract_courses_async(self):
         """Extract course timetable data asynchronously"""
         try:
-            self.course_timetable = {}
+            # Build into local dicts and publish them at the end, so a concurrent
+            # to_dict() never iterates a dict that is still growing
+            course_timetable = {}
+            timetable_refs = {}
 
             for course in self.courses_requested:
                 department = course.get('department', '')
@@ -116,20 +369,33 @@ class AIResponse:
                     department, number, self.semester)
 
                 if course_data is not None and not course_data.empty:
-                    self.course_timetable[course_code] = course_data
+                    if self.timetable_store is not None:
+                        # Store the cleaned table once and share it with other requests
+                        cleaned = self._clean_course_frame(course_data).drop(
+                            columns=['Instructor'], errors='ignore')
+                        ref = self.timetable_store.put(self.semester, course_code, cleaned)
+                        timetable_refs[course_code] = ref
+                        course_data = self.timetable_store.get(ref)
+                    course_timetable[course_code] = course_data
                 else:
                     print(f"Warning: No data found for course {course_code}")
 
+            self.timetable_refs = timetable_refs
+            self.course_timetable = course_timetable
+
             # Update stage to courses collected
             self.stage = "courses_collected"
             self.updated_at = datetime.now()
             print(
                 f"Course extraction completed for {len(self.course_timetable)} courses")
+            self._notify_update()
 
         except Exception as e:
             self._extraction_error = str(e)
             self.stage = "extraction_failed"
+            self.updated_at = datetime.now()
             print(f"Error during course extraction: {e}")
+            self._notify_update()
 
     def _extract_course_details(self, department, coursenumber, term_year):
         """Extract course details from Virginia Tech's course system - captures all time slots including labs/recitations"""
@@ -283,25 +549,29 @@ class AIResponse:
         cleaned_data = {}
         for course_code, df in self.course_timetable.items():
             if df is not None and not df.empty:
-                # Remove duplicates based on CRN, Days, Begin_Time, End_Time (using underscore format)
-                df_cleaned = df.drop_duplicates(
-                    subset=['CRN', 'Days', 'Begin_Time', 'End_Time'])
+                cleaned_data[course_code] = self._clean_course_frame(df)
 
-                # Clean location fields
-                if 'Location' in df_cleaned.columns:
-                    df_cleaned['Location'] = df_cleaned['Location'].apply(
-                        self._clean_location_field)
+        return cleaned_data
 
-                # Remove rows with empty essential fields
-                df_cleaned = df_cleaned.dropna(
-                    subset=['CRN', 'Course', 'Title', 'Schedule_Type'])
-                df_cleaned = df_cleaned[df_cleaned['CRN'].str.strip() != '']
-                df_cleaned = df_cleaned[df_cleaned['Course'].str.strip() != '']
-                df_cleaned = df_cleaned[df_cleaned['Title'].str.strip() != '']
+    def _clean_course_frame(self, df):
+        """Deduplicate and clean a single course's section table"""
+        # Remove duplicates based on CRN, Days, Begin_Time, End_Time (using underscore format)
+        df_cleaned = df.drop_duplicates(
+            subset=['CRN', 'Days', 'Begin_Time', 'End_Time'])
 
-                cleaned_data[course_code] = df_cleaned
+        # Clean location fields
+        if 'Location' in df_cleaned.columns:
+            df_cleaned['Location'] = df_cleaned['Location'].apply(
+                self._clean_location_field)
 
-        return cleaned_data
+        # Remove rows with empty essential fields
+        df_cleaned = df_cleaned.dropna(
+            subset=['CRN', 'Course', 'Title', 'Schedule_Type'])
+        df_cleaned = df_cleaned[df_cleaned['CRN'].str.strip() != '']
+        df_cleaned = df_cleaned[df_cleaned['Course'].str.strip() != '']
+        df_cleaned = df_cleaned[df_cleaned['Title'].str.strip() != '']
+
+        return df_cleaned
 
     def get_course_timetable(self):
         """Get the course timetable data (returns None if extraction is still in progress)"""
@@ -325,15 +595,18 @@ class AIResponse:
         """Update the stage and timestamp"""
         self.stage = new_stage
         self.updated_at = datetime.now()
+        self._notify_update()
 
     def set_ai_response(self, response):
         """Set the AI response and update stage"""
         self.ai_response = response
         self.stage = "done_processing"
         self.updated_at = datetime.now()
+        self._notify_update()
 
     def set_ai_error(self, error):
         """Set AI processing error and update stage"""
         self._extraction_error = error
         self.stage = "ai_failed"
         self.updated_at = datetime.now()
+        self._notify_update()
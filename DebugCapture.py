@@ -0,0 +1,110 @@
+import os
+import re
+import gzip
+import json
+import random
+import threading
+from collections import deque
+
+
+class DebugCapture:
+    def __init__(self, server_folder=None, capacity=50, sample_rate=0.0, persist_failures=True):
+        """
+        In-memory ring buffer of AI attempts with per-request files on disk
+
+        Every attempt is kept in a fixed-size ring buffer. When a request
+        finishes, its attempts are written to debug/<request id>.json.gz if
+        it failed (with persist_failures on), if it is picked by sampling,
+        or later on demand through persist().
+
+        Args:
+            server_folder: Folder under which the debug directory is created; None keeps attempts in memory only
+            capacity: Number of most recent attempts kept in memory
+            sample_rate: Fraction of successful requests whose attempts are written to disk
+            persist_failures: Write the attempts of every failed request to disk
+        """
+        self.folder = os.path.join(server_folder, "debug") if server_folder else None
+        self.sample_rate = sample_rate
+        self.persist_failures = persist_failures
+        self._lock = threading.Lock()
+        self._attempts = deque(maxlen=capacity)
+        # Attempts of requests still being processed, written out when they finish
+        self._current = {}
+
+        if self.folder and not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+
+    def record(self, request_id, entry):
+        """Add one attempt to the ring buffer and to its request's pending attempts"""
+        entry = dict(entry, request_id=str(request_id) if request_id is not None else None)
+        with self._lock:
+            self._attempts.append(entry)
+            if request_id is not None:
+                self._current.setdefault(str(request_id), []).append(entry)
+
+    def finish(self, request_id, success):
+        """
+        Close a request's capture, writing its attempts to disk if it failed or is sampled
+
+        Returns:
+            True if the attempts were written
+        """
+        if request_id is None:
+            return False
+        with self._lock:
+            attempts = self._current.pop(str(request_id), [])
+        if not attempts:
+            return False
+        if (not success and self.persist_failures) or random.random() < self.sample_rate:
+            return self._write(request_id, attempts)
+        return False
+
+    def persist(self, request_id):
+        """Write the attempts of a request still in the ring buffer to disk; returns True if any were written"""
+        attempts = self._buffered(request_id)
+        return self._write(request_id, attempts) if attempts else False
+
+    def get_attempts(self, request_id):
+        """Get the captured attempts of a request, from disk if persisted, else from the ring buffer"""
+        path = self._path(request_id)
+        if path and os.path.exists(path):
+            with gzip.open(path, 'rt') as f:
+                return json.load(f)
+        return self._buffered(request_id)
+
+    def get_recent(self):
+        """Get every attempt still held in the ring buffer, oldest first"""
+        with self._lock:
+            return list(self._attempts)
+
+    def _buffered(self, request_id):
+        """Get a request's attempts from the ring buffer and its pending attempts"""
+        request_id = str(request_id)
+        with self._lock:
+            pending = list(self._current.get(request_id, []))
+            buffered = [entry for entry in self._attempts if entry["request_id"] == request_id]
+        # Pending attempts are usually still in the ring buffer as well
+        return pending if len(pending) >= len(buffered) else buffered
+
+    def _path(self, request_id):
+        """Get the debug file path for a request id"""
+        if self.folder is None:
+            return None
+        # Request ids are UUIDs; anything else cannot escape the debug directory
+        safe_id = re.sub(r'[^A-Za-z0-9-]', '', str(request_id))
+        return os.path.join(self.folder, f"{safe_id}.json.gz")
+
+    def _write(self, request_id, attempts):
+        """Write attempts to the request's compressed debug file"""
+        path = self._path(request_id)
+        if path is None:
+            return False
+        try:
+            temp_path = path + ".tmp"
+            with gzip.open(temp_path, 'wt') as f:
+                json.dump(attempts, f)
+            os.replace(temp_path, path)
+            return True
+        except Exception as e:
+            print(f"Error saving debug capture for request {request_id}: {e}")
+            return False
@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on this platform; rotation is then only serialized within a process
+    fcntl = None
+
+
+class EventLog:
+    def __init__(self, server_folder, max_bytes=10 * 1024 * 1024, rotate_hours=24, backup_count=30,
+                 max_queue=10000):
+        """
+        Append-only JSON-lines event log with rotation and an asynchronous writer
+
+        log() only queues the event; a background thread appends queued
+        events to logs/events.jsonl in batches, one JSON object per line.
+        When that file grows past max_bytes or its first event is older than
+        rotate_hours it is renamed to logs/events-<UTC time>.jsonl, and only
+        the newest backup_count rotated segments are kept. Several processes
+        may write to the same log.
+
+        Drop policy: the queue holds at most max_queue events. When it is
+        full, because the disk cannot keep up, new events are dropped and
+        counted in dropped_count instead of blocking the caller.
+
+        Args:
+            server_folder: Folder under which the logs directory is created
+            max_bytes: Size at which the active segment is rotated
+            rotate_hours: Age of the oldest event at which the active segment is rotated
+            backup_count: Number of rotated segments to keep
+            max_queue: Maximum number of events waiting to be written
+        """
+        self.folder = os.path.join(server_folder, "logs")
+        self.active_file = os.path.join(self.folder, "events.jsonl")
+        self.lock_file = os.path.join(self.folder, "events.lock")
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_hours * 3600 if rotate_hours is not None else None
+        self.backup_count = backup_count
+        self.max_queue = max_queue
+        # Inode of the active segment and the time of its first event
+        self._active_started = (None, None)
+
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._accepted = 0
+        self._handled = 0
+        self.written_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+        self.running = True
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def log(self, event, data=None):
+        """
+        Queue one event for writing; never blocks on disk I/O
+
+        Args:
+            event: Event name
+            data: JSON-serializable event details
+
+        Returns:
+            The entry, whether it was queued or dropped
+        """
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "event": event,
+            "data": data or {}
+        }
+        line = json.dumps(entry) + "\n"
+
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                self.dropped_count += 1
+                return entry
+            self._queue.append(line)
+            self._accepted += 1
+            self._condition.notify_all()
+        return entry
+
+    def flush(self, timeout=10):
+        """Block until every event queued before this call has been written"""
+        with self._condition:
+            target = self._accepted
+            return self._condition.wait_for(lambda: self._handled >= target, timeout=timeout)
+
+    def stop(self):
+        """Write any queued events and stop the writer thread"""
+        self.flush()
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+        self.thread.join(timeout=5)
+
+    def get_stats(self):
+        """Get writer counters: queue depth, written, dropped and failed events"""
+        with self._condition:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue": self.max_queue,
+                "written": self.written_count,
+                "dropped": self.dropped_count,
+                "failed": self.failed_count
+            }
+
+    def _run(self):
+        """Writer loop: take everything queued and append it in one write"""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or not self.running)
+                if not self._queue and not self.running:
+                    return
+                lines = list(self._queue)
+                self._queue.clear()
+
+            written = False
+            try:
+                self._write(lines)
+                written = True
+            except Exception as e:
+                print(f"Error writing event log: {e}")
+
+            with self._condition:
+                if written:
+                    self.written_count += len(lines)
+                else:
+                    self.failed_count += len(lines)
+                self._handled += len(lines)
+                self._condition.notify_all()
+
+    def _write(self, lines):
+        """Append lines to the active segment, rotating it first if due"""
+        if self._rotation_due():
+            self._rotate()
+        # One O_APPEND write per batch keeps lines whole even with other writer processes
+        data = "".join(lines).encode("utf-8")
+        fd = os.open(self.active_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+
+    def _rotation_due(self):
+        """Check whether the active segment has reached its size or age limit"""
+        try:
+            stat = os.stat(self.active_file)
+        except FileNotFoundError:
+            return False
+        if stat.st_size == 0:
+            return False
+        if self.max_bytes is not None and stat.st_size >= self.max_bytes:
+            return True
+        if self.rotate_seconds is not None:
+            return time.time() - self._segment_start(stat.st_ino) >= self.rotate_seconds
+        return False
+
+    def _segment_start(self, inode):
+        """Get the time of the first event in the active segment, read once per segment"""
+        cached_inode, started = self._active_started
+        if cached_inode == inode:
+            return started
+        started = time.time()
+        try:
+            with open(self.active_file, 'r') as f:
+                first = json.loads(f.readline())
+            started = datetime.fromisoformat(first["timestamp"]).timestamp()
+        except (OSError, ValueError, KeyError):
+            pass
+        self._active_started = (inode, started)
+        return started
+
+    def _rotate(self):
+        """Rename the active segment and drop segments beyond backup_count"""
+        with open(self.lock_file, 'a') as lock_handle:
+            if fcntl is not None:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+            try:
+                # Another process may have rotated while this one waited for the lock
+                if not self._rotation_due():
+                    return
+                stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+                os.replace(self.active_file, os.path.join(self.folder, f"events-{stamp}.jsonl"))
+                self._active_started = (None, None)
+
+                if self.backup_count is not None:
+                    for segment in self.get_segments()[1:][self.backup_count:]:
+                        os.remove(segment)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+    def get_segments(self):
+        """Get the paths of all segments, newest first, starting with the active one"""
+        rotated = sorted((name for name in os.listdir(self.folder)
+                          if name.startswith("events-") and name.endswith(".jsonl")), reverse=True)
+        return [self.active_file] + [os.path.join(self.folder, name) for name in rotated]
+
+    def query(self, limit=100, cursor=None, events=None, request_id=None, since=None, until=None,
+              max_scan=100000):
+        """
+        Page backwards through the log from the newest event, with optional filters
+
+        Segments are read from their tail with seeks, so a page costs only
+        the lines scanned to fill it, not the size of the log.
+
+        Args:
+            limit: Maximum number of matching events to return
+            cursor: next_cursor from the previous page, or None to start at the newest event
+            events: Collection of event names to keep
+            request_id: Keep only events whose data carries this request_id
+            since: Keep only events at or after this timezone-aware datetime
+            until: Keep only events before this timezone-aware datetime
+            max_scan: Maximum number of lines to read for one page
+
+        Returns:
+            Dict with the matching events oldest first under "logs", and
+            "next_cursor" to continue with older events (None at the end)
+        """
+        entries = []
+        scanned = 0
+        start_inode, start_offset = self._parse_cursor(cursor)
+        started = start_inode is None
+
+        for path, inode, size in self._segment_positions():
+            end = size
+            if not started:
+                if inode != start_inode:
+                    continue
+                started = True
+                end = min(start_offset, size)
+
+            with open(path, 'rb') as f:
+                for offset, line in self._read_lines_reversed(f, end):
+                    if len(entries) >= limit or scanned >= max_scan:
+                        # Resume with this unread line on the next page
+                        return {"logs": entries[::-1], "next_cursor": f"{inode}:{offset + len(line)}"}
+                    scanned += 1
+                    try:
+                        entry = json.loads(line.decode("utf-8"))
+                        timestamp = datetime.fromisoformat(entry["timestamp"])
+                    except (ValueError, KeyError, UnicodeDecodeError):
+                        # A line still being written by another process
+                        continue
+                    if since is not None and timestamp < since:
+                        # Everything further back is older still
+                        return {"logs": entries[::-1], "next_cursor": None}
+                    if until is not None and timestamp >= until:
+                        continue
+                    if events and entry.get("event") not in events:
+                        continue
+                    if request_id is not None and str((entry.get("data") or {}).get("request_id")) != request_id:
+                        continue
+                    entries.append(entry)
+
+        return {"logs": entries[::-1], "next_cursor": None}
+
+    def _parse_cursor(self, cursor):
+        """Split a cursor into the inode of its segment and a byte offset"""
+        if not cursor:
+            return None, None
+        inode, offset = cursor.split(":")
+        return int(inode), int(offset)
+
+    def _segment_positions(self):
+        """Get (path, inode, size) for every segment, newest first"""
+        positions = []
+        for path in self.get_segments():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            positions.append((path, stat.st_ino, stat.st_size))
+        return positions
+
+    def _read_lines_reversed(self, f, end, block_size=65536):
+        """Yield (offset, line bytes) for the lines of an open file before end, from last to first"""
+        position = end
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + remainder
+            lines = data.split(b"\n")
+            # The first piece may be the tail of a line that starts in an earlier block
+            remainder = lines.pop(0)
+            line_end = position + len(data)
+            for line in reversed(lines):
+                line_start = line_end - len(line)
+                if line.strip():
+                    yield line_start, line
+                line_end = line_start - 1
+        if remainder.strip():
+            yield 0, remainder
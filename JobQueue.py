@@ -0,0 +1,193 @@
+import time
+import sqlite3
+import threading
+
+
+class JobQueue:
+    def __init__(self, db_file):
+        """
+        Durable lease-based queue of AI processing jobs
+
+        A worker claims the oldest available job and holds it for a lease
+        period (its visibility timeout), renewing the lease while it works.
+        The job is then acknowledged with ack(), or handed back with nack()
+        to be redelivered, optionally after a delay. A job whose lease runs
+        out becomes claimable again, so work held by a crashed worker is
+        picked up by another one. Queue order and in-flight jobs survive
+        restarts since everything lives in SQLite.
+
+        Args:
+            db_file: Path of the SQLite database; point every worker at the same file,
+                or use ":memory:" for a queue private to this process
+        """
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        # Autocommit mode so claim() can open its own BEGIN IMMEDIATE transaction
+        self.connection = sqlite3.connect(db_file, check_same_thread=False, timeout=30, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the jobs table and its indexes if they do not exist"""
+        with self._lock:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    request_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    available_at REAL NOT NULL DEFAULT 0
+                )
+            """)
+            columns = [row["name"] for row in self.connection.execute("PRAGMA table_info(jobs)")]
+            if "available_at" not in columns:
+                # Job tables created before nack() delays existed
+                self.connection.execute("ALTER TABLE jobs ADD COLUMN available_at REAL NOT NULL DEFAULT 0")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, enqueued_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (state, lease_expires)")
+
+    def enqueue(self, request_id):
+        """Add a job for a request; does nothing if the request already has one"""
+        now = time.time()
+        with self._lock:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO jobs (request_id, state, enqueued_at, available_at) VALUES (?, 'queued', ?, ?)",
+                (str(request_id), now, now))
+        return cursor.rowcount > 0
+
+    def claim(self, worker_id, lease_seconds):
+        """
+        Claim the oldest available queued job, or one whose lease has expired
+
+        Returns:
+            The claimed request id, or None if nothing is available
+        """
+        now = time.time()
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.connection.execute(
+                    "SELECT request_id FROM jobs WHERE state = 'queued' AND available_at <= ? "
+                    "ORDER BY enqueued_at, rowid LIMIT 1", (now,)).fetchone()
+                if row is None:
+                    row = self.connection.execute(
+                        "SELECT request_id FROM jobs WHERE state = 'claimed' AND lease_expires < ? "
+                        "ORDER BY lease_expires LIMIT 1", (now,)).fetchone()
+                if row is not None:
+                    self.connection.execute(
+                        "UPDATE jobs SET state = 'claimed', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                        "WHERE request_id = ?", (worker_id, now + lease_seconds, row["request_id"]))
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return row["request_id"] if row is not None else None
+
+    def acquire(self, request_id, worker_id, lease_seconds):
+        """Add a job already claimed by a worker, for work it starts itself; replaces any existing job"""
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO jobs (request_id, state, owner, lease_expires, attempts, enqueued_at, "
+                "available_at) VALUES (?, 'claimed', ?, ?, 1, ?, ?)",
+                (str(request_id), worker_id, now + lease_seconds, now, now))
+
+    def renew(self, request_id, worker_id, lease_seconds):
+        """Extend the lease on a job; returns False if the worker no longer owns it"""
+        with self._lock:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE request_id = ? AND owner = ? AND state = 'claimed'",
+                (time.time() + lease_seconds, str(request_id), worker_id))
+        return cursor.rowcount > 0
+
+    def ack(self, request_id, worker_id):
+        """Remove a finished job; returns False if the worker no longer owns it"""
+        with self._lock:
+            cursor = self.connection.execute(
+                "DELETE FROM jobs WHERE request_id = ? AND owner = ?", (str(request_id), worker_id))
+        return cursor.rowcount > 0
+
+    def nack(self, request_id, worker_id, delay=0):
+        """
+        Hand a claimed job back to the queue without counting it as done
+
+        The job keeps its place in the queue and becomes claimable again
+        after delay seconds. Returns False if the worker no longer owns it.
+        """
+        with self._lock:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET state = 'queued', owner = NULL, lease_expires = NULL, available_at = ? "
+                "WHERE request_id = ? AND owner = ?", (time.time() + delay, str(request_id), worker_id))
+        return cursor.rowcount > 0
+
+    def nack_owned(self, worker_id):
+        """Hand back every job a worker holds, e.g. jobs left in flight by its previous run"""
+        with self._lock:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET state = 'queued', owner = NULL, lease_expires = NULL "
+                "WHERE owner = ? AND state = 'claimed'", (worker_id,))
+        return cursor.rowcount
+
+    def count(self, state=None):
+        """Count all jobs, or only those in a given state"""
+        with self._lock:
+            if state is None:
+                row = self.connection.execute("SELECT COUNT(*) FROM jobs").fetchone()
+            else:
+                row = self.connection.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (state,)).fetchone()
+        return row[0]
+
+    def get_queued_ids(self):
+        """Get the ids of every queued job in queue order"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT request_id FROM jobs WHERE state = 'queued' ORDER BY enqueued_at, rowid").fetchall()
+        return [row["request_id"] for row in rows]
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.connection.close()
+
+
+class JobLeaseKeeper:
+    def __init__(self, job_queue, request_id, worker_id, lease_seconds):
+        """
+        Background heartbeat that keeps renewing a claimed job's lease
+
+        Args:
+            job_queue: JobQueue holding the job
+            request_id: Id of the claimed job
+            worker_id: Id of the worker that claimed it
+            lease_seconds: Lease length; the lease is renewed every third of it
+        """
+        self.job_queue = job_queue
+        self.request_id = request_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self.thread.join(timeout=5)
+        return False
+
+    def _run(self):
+        """Renew the lease until stopped or until another worker takes the job"""
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.job_queue.renew(self.request_id, self.worker_id, self.lease_seconds):
+                    self.lost = True
+                    print(f"Lost lease on job {self.request_id}")
+                    return
+            except Exception as e:
+                print(f"Error renewing lease on job {self.request_id}: {e}")
@@ -0,0 +1,158 @@
+import gc
+import os
+import sys
+import time
+import threading
+from AIResponse import AIResponse
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; RSS is then only read from /proc when present
+    resource = None
+
+
+class MemoryManager:
+    def __init__(self, waitlist, budget_mb=None, check_interval=30):
+        """
+        Keeps the in-memory request cache of a WaitList within bounds
+
+        Timetables of finished requests are released as soon as the request
+        reaches a terminal stage, since only the AI result is read after that.
+        With a budget set, a background thread also checks the process RSS and
+        releases timetables of requests still waiting for AI processing,
+        oldest first, when the budget is exceeded. Released timetables stay in
+        the TimetableStore and are loaded back on next access.
+
+        Args:
+            waitlist: WaitList whose requests are managed
+            budget_mb: RSS budget in megabytes, or None to only release finished requests
+            check_interval: Seconds between budget checks
+        """
+        self.waitlist = waitlist
+        self.budget_bytes = int(budget_mb * 1024 * 1024) if budget_mb is not None else None
+        self.check_interval = check_interval
+        self.released_count = 0
+        self.budget_exceeded_count = 0
+        self.running = False
+        self.thread = None
+
+        if self.budget_bytes is not None:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def on_update(self, response):
+        """Release a request's timetable once it reaches a terminal stage"""
+        if response.status.stage in AIResponse.TERMINAL_STAGES:
+            self._release(response)
+
+    def _release(self, response):
+        """Release one request's timetable and count it"""
+        try:
+            if response.release_timetable():
+                self.released_count += 1
+                return True
+        except Exception as e:
+            print(f"Error releasing timetable for request {response.id}: {e}")
+        return False
+
+    def release_finished(self):
+        """Release the timetables of every finished request held in memory"""
+        released = 0
+        for response in self.waitlist.get_waitlist():
+            if response.status.stage in AIResponse.TERMINAL_STAGES and self._release(response):
+                released += 1
+        return released
+
+    def enforce_budget(self):
+        """
+        Release timetables until the process is back under its RSS budget
+
+        Returns:
+            Number of timetables released
+        """
+        if self.budget_bytes is None or self.get_rss_bytes() <= self.budget_bytes:
+            return 0
+
+        self.budget_exceeded_count += 1
+        released = self.release_finished()
+        gc.collect()
+
+        if self.get_rss_bytes() > self.budget_bytes:
+            # Queued requests reload their timetable from the store when the AI picks them up
+            waiting = sorted(self.waitlist.get_requests_in_stage("courses_collected"),
+                             key=lambda r: r.created_at)
+            for response in waiting:
+                if self._release(response):
+                    released += 1
+            gc.collect()
+
+        if released:
+            print(f"Memory budget exceeded - released {released} timetables, "
+                  f"RSS now {self.get_rss_bytes() // (1024 * 1024)} MB")
+        return released
+
+    def get_rss_bytes(self):
+        """Get the resident set size of this process in bytes"""
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            pass
+        if resource is not None:
+            # Peak rather than current RSS, reported in kilobytes on Linux and bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+        return 0
+
+    def get_report(self):
+        """
+        Get current memory use, broken down by request stage
+
+        Timetable bytes count each shared DataFrame once, against the first
+        stage found holding it. Serialized bytes are the cached JSON encodings.
+        """
+        stages = {}
+        seen_frames = set()
+        for response in self.waitlist.get_waitlist():
+            stage = response.status.stage
+            entry = stages.setdefault(stage, {
+                "requests": 0,
+                "timetables_resident": 0,
+                "timetable_bytes": 0,
+                "serialized_bytes": 0
+            })
+            entry["requests"] += 1
+
+            frames = response.get_resident_frames()
+            if frames:
+                entry["timetables_resident"] += 1
+                for df in frames:
+                    if id(df) not in seen_frames:
+                        seen_frames.add(id(df))
+                        entry["timetable_bytes"] += int(df.memory_usage(deep=True).sum())
+            entry["serialized_bytes"] += response.get_serialized_size()
+
+        return {
+            "timestamp": time.time(),
+            "rss_bytes": self.get_rss_bytes(),
+            "budget_bytes": self.budget_bytes,
+            "timetables_cached": self.waitlist.timetable_store.get_cached_count(),
+            "timetables_released": self.released_count,
+            "budget_exceeded_count": self.budget_exceeded_count,
+            "stages": stages
+        }
+
+    def stop(self):
+        """Stop the budget check thread"""
+        self.running = False
+
+    def _run(self):
+        """Periodically enforce the RSS budget"""
+        while self.running:
+            time.sleep(self.check_interval)
+            try:
+                self.enforce_budget()
+            except Exception as e:
+                print(f"Error enforcing memory budget: {e}")
@@ -0,0 +1,56 @@
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on this platform; every process acts as the only one
+    fcntl = None
+
+
+class ProcessLease:
+    def __init__(self, server_folder, name="ai_processor"):
+        """
+        Host-wide exclusive lease backed by flock on a file in server_folder
+
+        The lease is held for as long as the owning process keeps the file
+        open, and the kernel releases it automatically if that process dies.
+
+        Args:
+            server_folder: Folder holding the lock file
+            name: Name of the lease, used for the lock file name
+        """
+        self.lock_file = os.path.join(server_folder, f"{name}.lock")
+        self._file = None
+
+    def try_acquire(self):
+        """Try to take the lease without blocking; returns True if this process holds it"""
+        if self._file is not None:
+            return True
+
+        lock_handle = open(self.lock_file, 'a+')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_handle.close()
+                return False
+
+        # Record the holder for anyone inspecting the lock file
+        lock_handle.seek(0)
+        lock_handle.truncate()
+        lock_handle.write(str(os.getpid()))
+        lock_handle.flush()
+        self._file = lock_handle
+        return True
+
+    def release(self):
+        """Give up the lease if this process holds it"""
+        if self._file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def is_held(self):
+        """Check whether this process currently holds the lease"""
+        return self._file is not None
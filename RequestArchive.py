@@ -0,0 +1,172 @@
+import os
+import json
+import gzip
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on this platform; archiving is then only serialized within a process
+    fcntl = None
+
+
+class RequestArchive:
+    def __init__(self, server_folder):
+        """
+        Cold storage for finished requests
+
+        Records are appended to compressed, date-segmented files named
+        archive/YYYY-MM-DD.jsonl.gz after the day they were last updated.
+        archive/index.jsonl maps each archived id to its segment, final
+        stage and summary fields so lookups never have to scan the segments.
+        Several processes may share the archive: each one tails the index
+        for entries appended by the others.
+
+        Args:
+            server_folder: Folder under which the archive directory is created
+        """
+        self.folder = os.path.join(server_folder, "archive")
+        self.index_file = os.path.join(self.folder, "index.jsonl")
+        self.lock_file = os.path.join(self.folder, "archive.lock")
+        self._lock = threading.Lock()
+        # Bytes of index.jsonl read so far
+        self._index_offset = 0
+        self._index = {}
+        # Lowercased email to archived ids, for request history lookups
+        self._email_index = {}
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        self.refresh()
+
+    def refresh(self):
+        """Read index entries appended since the last read, by this or any other process"""
+        with self._lock:
+            try:
+                if os.path.getsize(self.index_file) <= self._index_offset:
+                    return
+            except FileNotFoundError:
+                return
+            with open(self.index_file, 'rb') as f:
+                f.seek(self._index_offset)
+                data = f.read()
+            # A line still being written by another process is read on the next refresh
+            complete = data[:data.rfind(b"\n") + 1]
+            self._index_offset += len(complete)
+            for line in complete.decode("utf-8").splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    print("Skipping unreadable archive index entry")
+                    continue
+                self._add_to_index(entry)
+
+    def _add_to_index(self, entry):
+        """Add an index entry to the id and email lookups"""
+        known = entry["id"] in self._index
+        self._index[entry["id"]] = entry
+        # Entries written before summaries were indexed carry no email
+        if entry.get("email") and not known:
+            self._email_index.setdefault(entry["email"].strip().lower(), []).append(entry["id"])
+
+    def archive(self, records):
+        """
+        Append records to their date segments and index them
+
+        Args:
+            records: Records in AIResponse.to_dict() format
+        """
+        by_segment = {}
+        for record in records:
+            segment = record["updated_at"][:10] + ".jsonl.gz"
+            by_segment.setdefault(segment, []).append(record)
+
+        with self._lock:
+            index_entries = []
+            for segment, segment_records in by_segment.items():
+                # Appending a new gzip member keeps the segment a valid gzip file
+                with gzip.open(os.path.join(self.folder, segment), 'at') as f:
+                    for record in segment_records:
+                        f.write(json.dumps(record) + "\n")
+                for record in segment_records:
+                    index_entries.append({
+                        "id": record["id"],
+                        "segment": segment,
+                        "stage": record["stage"],
+                        "email": record.get("email"),
+                        "semester": record.get("semester"),
+                        "courses_requested": record.get("courses_requested"),
+                        "preferences": record.get("preferences"),
+                        "created_at": record.get("created_at"),
+                        "updated_at": record.get("updated_at"),
+                        "timeline": record.get("timeline")
+                    })
+
+            # One append per batch keeps lines whole for processes tailing the index
+            with open(self.index_file, 'a') as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in index_entries))
+        self.refresh()
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the archive's cross-process lock, so only one process moves records into it at a time"""
+        with open(self.lock_file, 'a') as lock_handle:
+            if fcntl is not None:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+    def _lookup(self, id):
+        """Get an index entry, checking for entries from other processes on a miss"""
+        entry = self._index.get(str(id))
+        if entry is None:
+            self.refresh()
+            entry = self._index.get(str(id))
+        return entry
+
+    def get_stage(self, id):
+        """Get the final stage of an archived request, or None if it is not archived"""
+        entry = self._lookup(id)
+        return entry["stage"] if entry else None
+
+    def get_index_entry(self, id):
+        """Get the index entry of an archived request, or None if it is not archived"""
+        return self._lookup(id)
+
+    def get_record(self, id):
+        """Read an archived record back from its segment, or None if it is not archived"""
+        entry = self._lookup(id)
+        if entry is None:
+            return None
+
+        with gzip.open(os.path.join(self.folder, entry["segment"]), 'rt') as f:
+            for line in f:
+                if entry["id"] in line:
+                    record = json.loads(line)
+                    if record["id"] == entry["id"]:
+                        return record
+        return None
+
+    def get_summaries_by_email(self, email, before=None):
+        """Get summaries of a user's archived requests created before an ISO timestamp"""
+        self.refresh()
+        summaries = []
+        for id in list(self._email_index.get(email.strip().lower(), ())):
+            entry = self._index[id]
+            if before is not None and (entry.get("created_at") or "") >= before:
+                continue
+            summaries.append({key: entry.get(key) for key in (
+                "id", "stage", "semester", "courses_requested", "preferences", "created_at", "updated_at")})
+        return summaries
+
+    def count(self):
+        """Get the number of archived requests"""
+        self.refresh()
+        return len(self._index)
@@ -0,0 +1,91 @@
+import os
+import re
+import json
+import uuid
+import hashlib
+import threading
+import weakref
+import pandas as pd
+
+
+class TimetableStore:
+    def __init__(self, server_folder):
+        """
+        Content-addressed store for scraped course timetables
+
+        Each distinct section table is written once under
+        timetables/<term>/<course>/<hash>.json and shared by every request
+        that references it, both on disk and in memory.
+
+        Args:
+            server_folder: Folder under which the timetables directory is created
+        """
+        self.folder = os.path.join(server_folder, "timetables")
+        self._lock = threading.Lock()
+        # Frames stay shared for as long as any AIResponse holds them
+        self._frames = weakref.WeakValueDictionary()
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+
+    def _safe_name(self, value):
+        """Strip anything that could escape the store directory"""
+        return re.sub(r'[^A-Za-z0-9]', '', str(value)) or "unknown"
+
+    def _path(self, ref):
+        """Get the file path for a reference"""
+        return os.path.join(self.folder, *ref.split("/")) + ".json"
+
+    def put(self, term, course_code, df):
+        """
+        Store a course timetable and return its reference
+
+        Args:
+            term: Term/year code the timetable was scraped for
+            course_code: Course code such as CS2114
+            df: Cleaned section DataFrame
+
+        Returns:
+            Reference string of the form term/course/hash
+        """
+        records = df.to_dict('records')
+        payload = json.dumps(records)
+        content_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        ref = f"{self._safe_name(term)}/{self._safe_name(course_code)}/{content_hash}"
+
+        path = self._path(ref)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Other processes may write the same blob at once, so each writes its own temp file
+                temp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+                try:
+                    with open(temp_path, 'w') as f:
+                        f.write(payload)
+                    # Same content under the same name, so whichever write lands last is fine
+                    os.replace(temp_path, path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+        return ref
+
+    def get(self, ref):
+        """Get the shared DataFrame for a reference (empty if the blob is missing)"""
+        with self._lock:
+            df = self._frames.get(ref)
+            if df is not None:
+                return df
+
+            path = self._path(ref)
+            if not os.path.exists(path):
+                print(f"Warning: Timetable blob {ref} not found")
+                return pd.DataFrame()
+
+            with open(path, 'r') as f:
+                df = pd.DataFrame(json.load(f))
+            self._frames[ref] = df
+            return df
+
+    def get_cached_count(self):
+        """Get the number of distinct timetables currently held in memory"""
+        return len(self._frames)
@@ -1,11 +1,29 @@
 import os       
 import json
-from uuid import uuid4
-from AIResponse import AIResponse
+import time
+import atexit
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4, UUID
+from AIResponse import AIResponse, RequestStatus
 from AIProcessor import AIProcessor
 from AIProcessorThread import AIProcessorThread
+from WaitListJournal import WaitListJournal
+from WaitListDatabase import WaitListDatabase
+from TimetableStore import TimetableStore
+from RequestArchive import RequestArchive
+from WaitListFlusher import WaitListFlusher
+from ProcessLease import ProcessLease
+from JobQueue import JobQueue, JobLeaseKeeper
+from MemoryManager import MemoryManager
+from EventLog import EventLog
+from WaitListStats import WaitListStats
 
 class WaitList:
+    # Number of lock stripes that per-request index updates are spread over
+    _STRIPE_COUNT = 16
+    
     def __init__(self, server_folder, ai_config):
         if ai_config is None:
             raise ValueError("AI config is required for WaitList")
@@ -13,56 +31,811 @@ class WaitList:
         self.server_folder = server_folder
         self.on_waitlist = False
         
+        # Locking: readers never lock. They read self._index, the per-request
+        # RequestStatus snapshots and tuple() copies of the stage sets, all of
+        # which are replaced or updated atomically. Writers take the membership
+        # lock to add or remove requests and the stripe for a request's id to
+        # move it between stage sets. Order: write lock, membership lock, stripe.
+        self._membership_lock = threading.RLock()
+        self._stripes = [threading.Lock() for _ in range(self._STRIPE_COUNT)]
+        # Serializes disk writes
+        self._write_lock = threading.Lock()
+        
+        # Lookup index by request id and stage membership, kept in step with self.waitlist
+        self._index = {}
+        self._stage_members = {stage: set() for stage in AIResponse.ACTIVE_STAGES + AIResponse.TERMINAL_STAGES}
+        self._indexed_stage = {}
+        # Lowercased email to request ids, for request history lookups
+        self._email_members = {}
+        # Condition and waiter count per request id, for callers waiting on its next status change
+        self._watch_lock = threading.Lock()
+        self._watchers = {}
+        
+        # Persistence mode: "snapshot" rewrites user_data.json on every save,
+        # "journal" appends each mutation and compacts periodically, "sqlite"
+        # keeps records in user_data.db and only in-flight requests in memory
+        self.config = ai_config.get("waitlist", {})
+        self.persistence = self.config.get("persistence", "snapshot")
+        
         # Ensure server folder exists
         if not os.path.exists(self.server_folder):
             os.makedirs(self.server_folder)
         
-        # Check if user_data.json exists
+        # With leader_election on, only the process holding the lease runs course
+        # extraction and AI processing; the others hand requests over through sqlite
+        self.lease = None
+        self.is_leader = True
+        if self.config.get("leader_election"):
+            if self.persistence != "sqlite":
+                raise ValueError("leader_election requires sqlite persistence")
+            self.lease = ProcessLease(self.server_folder)
+            self.is_leader = self.lease.try_acquire()
+        
+        # AI work goes through a lease-based job queue. With distributed_workers
+        # on, AI workers on any machine sharing the store claim from the same queue
+        self.distributed = bool(self.config.get("distributed_workers"))
+        if self.distributed and self.persistence != "sqlite":
+            raise ValueError("distributed_workers requires sqlite persistence")
+        # Without either, requests live in this process's memory, so it must be the only
+        # process serving the folder; several workers need leader_election
+        self._store_lease = None
+        if self.lease is None and not self.distributed:
+            self._store_lease = ProcessLease(self.server_folder, "waitlist")
+            if not self._store_lease.try_acquire():
+                raise ValueError(f"Another process already serves {self.server_folder}; "
+                                 "running several workers requires sqlite persistence with leader_election")
+        # A single local worker keeps its id across restarts so it can take back its own in-flight jobs
+        self.worker_id = self.config.get("worker_id") or (
+            f"{socket.gethostname()}-{os.getpid()}" if self.distributed else socket.gethostname())
+        self.job_queue = JobQueue(self.config.get("job_store") or os.path.join(self.server_folder, "jobs.db"))
+        # Distributed workers hold a lease on each course extraction they run; one left
+        # behind by a worker that died is taken over by another once its lease runs out
+        self.extraction_queue = None
+        self._extraction_leases = {}
+        if self.distributed:
+            self.extraction_queue = JobQueue(self.config.get("extraction_job_store") or
+                                             os.path.join(self.server_folder, "extraction_jobs.db"))
+        
+        # Event log shared by the server and the AI processor, written by a background thread
+        self.event_log = EventLog(self.server_folder,
+                                  self.config.get("log_max_bytes", 10 * 1024 * 1024),
+                                  self.config.get("log_rotate_hours", 24),
+                                  self.config.get("log_backup_count", 30),
+                                  self.config.get("log_queue_size", 10000))
+        
+        # Scraped timetables are stored once per distinct content and referenced by requests
+        self.timetable_store = TimetableStore(self.server_folder)
+        
+        # Finished requests older than retention_hours move to the archive
+        self.archive = RequestArchive(self.server_folder)
+        
+        # With commit_window_ms set, saves are coalesced by a background flusher
+        self.flusher = None
+        if self.config.get("commit_window_ms") is not None:
+            self.flusher = WaitListFlusher(self._write, self.config["commit_window_ms"] / 1000)
+            atexit.register(self.flusher.stop)
+        
         waitlist_file = os.path.join(self.server_folder, "user_data.json")
-        if os.path.exists(waitlist_file):
+        if self.persistence == "journal":
+            self.journal = WaitListJournal(self.server_folder, self.config.get("compact_every", 500))
+            self.from_dict(self.journal.load())
+            if self.journal.records_since_compaction > 0:
+                self.save()
+        elif self.persistence == "sqlite":
+            self.database = WaitListDatabase(self.server_folder)
+            if self.database.is_empty() and os.path.exists(waitlist_file):
+                self.database.import_json(waitlist_file)
+            if self.is_leader and not self.distributed:
+                self.from_dict(self.database.get_records_by_stage(AIResponse.ACTIVE_STAGES))
+            else:
+                # Followers and distributed workers only hold the requests they are working on
+                # and read every other one from the database
+                self.waitlist = []
+        elif os.path.exists(waitlist_file):
+            # Check if user_data.json exists
             self.from_dict(json.load(open(waitlist_file)))
         else:
             self.waitlist = []
             with open(waitlist_file, "w") as f:
                 json.dump([], f)
-        self.save()
+        
+        # Live counters for status pages, seeded from the store and then kept up
+        # to date on every transition; re-read from sqlite when shared with other processes
+        self.shared_store = self.lease is not None or self.distributed
+        self.stats = WaitListStats(self.get_stage_counts(), self._recent_completion_times())
+        # With a shared store, timings come from the timelines of recent completions,
+        # re-read at most every timings_refresh_seconds
+        self._timings_lock = threading.Lock()
+        self._shared_timings = (0, None)
+        # Queue positions, re-read from the job queue at most every queue_refresh_seconds
+        # so status polls do not query it each time
+        self._queue_lock = threading.Lock()
+        self._queue_snapshot = (0, {}, 0, 0)
+        # AI processor state published by the lease holder, re-read at most every
+        # processor_state_refresh_seconds by processes that do not run the AI processor
+        self._processor_state_lock = threading.Lock()
+        self._processor_state = (0, None)
+        
+        # Timetables of finished requests are dropped from memory; memory_budget_mb
+        # also caps process RSS by releasing timetables of queued requests
+        self.memory_manager = MemoryManager(self, self.config.get("memory_budget_mb"),
+                                            self.config.get("memory_check_seconds", 30))
+        
+        self._retention_thread = None
         
         # Initialize AI Processor Thread
         self.ai_processor_thread = AIProcessorThread(self, ai_config)
+        if self.lease is None:
+            self._start_retention()
+            self.ai_processor_thread.start()
+            if self.distributed:
+                self._adopt_thread = threading.Thread(target=self._adopt_loop, daemon=True)
+                self._adopt_thread.start()
+        elif self.is_leader:
+            self._become_leader()
+        else:
+            print("Another process holds the AI processor lease - serving requests only")
+            self._lease_thread = threading.Thread(target=self._lease_loop, daemon=True)
+            self._lease_thread.start()
+    
+    def _lease_loop(self):
+        """Keep trying to take over the AI processor lease until this process holds it"""
+        interval = self.config.get("lease_retry_seconds", 5)
+        while not self.is_leader:
+            time.sleep(interval)
+            try:
+                if self.lease.try_acquire():
+                    self.from_dict(self.database.get_records_by_stage(AIResponse.ACTIVE_STAGES))
+                    self.is_leader = True
+                    self._become_leader()
+            except Exception as e:
+                print(f"Error acquiring AI processor lease: {e}")
+    
+    def _become_leader(self):
+        """Resume work left behind by a previous leader and start the AI processor"""
+        print(f"Process {os.getpid()} holds the AI processor lease")
+        # Extraction threads died with the previous leader, so start them again here
+        for stage in ("initiated", "extracting_courses"):
+            for response in self.get_requests_in_stage(stage):
+                response.start_extraction()
+        self._start_retention()
         self.ai_processor_thread.start()
+        # Followers cannot signal this process, so their submissions are polled for here,
+        # on a thread of its own so adoption never waits behind an AI call
+        self._adopt_thread = threading.Thread(target=self._adopt_loop, daemon=True)
+        self._adopt_thread.start()
+    
+    def _adopt_loop(self):
+        """Keep adopting requests submitted by follower processes, or left behind by dead distributed workers"""
+        interval = self.config.get("adopt_check_seconds", 1)
+        while True:
+            try:
+                self.adopt_new_requests()
+            except Exception as e:
+                print(f"Error adopting new requests: {e}")
+            time.sleep(interval)
+    
+    def adopt_new_requests(self):
+        """
+        Pick up requests that other processes submitted through the shared store
+        and start their course extraction here. Only the lease holder does this;
+        distributed workers instead take over extractions whose lease expired.
+        """
+        if self.distributed:
+            return self._adopt_orphaned_extractions()
+        if self.lease is None or not self.is_leader:
+            return 0
+        adopted = 0
+        for id in self.database.get_ids_by_stage("initiated"):
+            if UUID(id) in self._index:
+                continue
+            record = self.database.get_record(id)
+            if record is None:
+                continue
+            response = AIResponse.from_dict(record, self.timetable_store)
+            response.on_update = self._on_response_update
+            with self._membership_lock:
+                self.waitlist.append(response)
+                self._index_add(response)
+            response.start_extraction()
+            adopted += 1
+        return adopted
+    
+    def _adopt_orphaned_extractions(self):
+        """Restart course extractions whose distributed worker stopped renewing their lease"""
+        adopted = 0
+        lease_seconds = self.config.get("job_lease_seconds", 120)
+        while True:
+            request_id = self.extraction_queue.claim(self.worker_id, lease_seconds)
+            if request_id is None:
+                return adopted
+            status = self.database.get_status(request_id)
+            response = (self.load_request(UUID(request_id))
+                        if status is not None and status[0] in ("initiated", "extracting_courses") else None)
+            if response is None:
+                # Gone, or its extraction finished before the lease ran out
+                self.extraction_queue.ack(request_id, self.worker_id)
+                continue
+            self._start_extraction(response, lease_held=True)
+            print(f"Took over course extraction of request {request_id}")
+            adopted += 1
+    
+    def _start_extraction(self, response, lease_held=False):
+        """Start a request's course extraction, holding its extraction lease when distributed"""
+        if self.extraction_queue is not None:
+            if not lease_held:
+                self.extraction_queue.acquire(response.id, self.worker_id,
+                                              self.config.get("job_lease_seconds", 120))
+            lease = JobLeaseKeeper(self.extraction_queue, str(response.id), self.worker_id,
+                                   self.config.get("job_lease_seconds", 120))
+            self._extraction_leases[response.id] = lease.__enter__()
+        response.start_extraction()
+    
+    def _finish_extraction(self, response):
+        """Drop a distributed request's extraction lease once its extraction has ended"""
+        lease = self._extraction_leases.pop(response.id, None)
+        if lease is None:
+            return
+        lease.__exit__(None, None, None)
+        # Its AI job, if any, is queued by now; the result must be stored before nobody owns the extraction
+        self.flush()
+        self.extraction_queue.ack(str(response.id), self.worker_id)
     
     def new_request(self, email, courses_requested, preferences, semester="202501"):
         id = uuid4()
-        self.waitlist.append(AIResponse(id, courses_requested, semester, preferences, email))
-        self.save()
+        response = AIResponse(id, courses_requested, semester, preferences, email,
+                              on_update=self._on_response_update,
+                              timetable_store=self.timetable_store,
+                              start_extraction=False)
+        if not self.is_leader:
+            # Written straight through so the leader and any other worker can see it at once
+            self._write([response], False)
+            self.stats.record_transition(None, response.status.stage)
+            return id
+        with self._membership_lock:
+            self.waitlist.append(response)
+            self._index_add(response, new=True)
+        # Started only once indexed, so the AI thread can always load the request its job refers to;
+        # the update hook saves the request as its extraction starts
+        self._start_extraction(response)
         return id
+    
+    def _stripe(self, id):
+        """Get the lock guarding index updates for a request id"""
+        return self._stripes[hash(id) % self._STRIPE_COUNT]
+    
+    def _index_add(self, response, new=False):
+        """Add a request to the id index and its stage set, counting it in the stats if new"""
+        with self._stripe(response.id):
+            self._index[response.id] = response
+            self._index_stage(response)
+            if new:
+                # Under the stripe so the first transition recorded by the update hook follows this one
+                self.stats.record_transition(None, self._indexed_stage[response.id])
+            if response.email:
+                self._email_members.setdefault(response.email.strip().lower(), set()).add(response.id)
+    
+    def _index_stage(self, response):
+        """Move a request into the stage set matching its current stage (stripe held by caller)"""
+        previous = self._indexed_stage.get(response.id)
+        stage = response.status.stage
+        if previous == stage:
+            return
+        if previous is not None:
+            self._stage_members[previous].discard(response.id)
+        self._stage_members.setdefault(stage, set()).add(response.id)
+        self._indexed_stage[response.id] = stage
+    
+    def _index_remove(self, response):
+        """Drop a request from the id index and its stage set"""
+        with self._stripe(response.id):
+            self._index.pop(response.id, None)
+            previous = self._indexed_stage.pop(response.id, None)
+            if previous is not None:
+                self._stage_members[previous].discard(response.id)
+            if response.email:
+                self._email_members.get(response.email.strip().lower(), set()).discard(response.id)
+    
+    def get_status_snapshot(self, id):
+        """Get the immutable RequestStatus for a request, or None if it does not exist"""
+        response = self._index.get(id)
+        if response is not None:
+            return response.status
+        if self.persistence == "sqlite":
+            status = self.database.get_status(id)
+            if status is not None:
+                stage, updated_at = status
+                return RequestStatus(stage, datetime.fromisoformat(updated_at), None)
+        stage = self.archive.get_stage(id)
+        if stage is not None:
+            return RequestStatus(stage, None, None)
+        return None
+    
+    def get_status_snapshots(self, ids):
+        """
+        Get the RequestStatus of several requests at once
+        
+        Requests in memory are read from the index, the rest with a single
+        database query, falling back to the archive.
+        
+        Returns:
+            Dict mapping each id that exists to its RequestStatus
+        """
+        snapshots = {}
+        missing = []
+        for id in ids:
+            response = self._index.get(id)
+            if response is not None:
+                snapshots[id] = response.status
+            else:
+                missing.append(id)
+        if missing and self.persistence == "sqlite":
+            stored = self.database.get_statuses(missing)
+            remaining = []
+            for id in missing:
+                if str(id) in stored:
+                    stage, updated_at = stored[str(id)]
+                    snapshots[id] = RequestStatus(stage, datetime.fromisoformat(updated_at), None)
+                else:
+                    remaining.append(id)
+            missing = remaining
+        for id in missing:
+            stage = self.archive.get_stage(id)
+            if stage is not None:
+                snapshots[id] = RequestStatus(stage, None, None)
+        return snapshots
+        
+    def wait_for_status_change(self, id, known_status, timeout):
+        """
+        Block until a request's stage or update time differs from known_status
+        
+        Changes made in this process wake the caller at once. Changes made by
+        other processes are only seen when the timeout runs out, so callers
+        should wait in a loop with a short timeout.
+        
+        Args:
+            id: Request id
+            known_status: RequestStatus the caller already has
+            timeout: Maximum number of seconds to wait
         
+        Returns:
+            The current RequestStatus, or None if the request no longer exists
+        """
+        def changed():
+            status = self.get_status_snapshot(id)
+            return status is None or (status.stage, status.updated_at) != (known_status.stage, known_status.updated_at)
+        
+        with self._watch_lock:
+            condition, waiters = self._watchers.get(id, (None, 0))
+            if condition is None:
+                condition = threading.Condition()
+            self._watchers[id] = (condition, waiters + 1)
+        try:
+            with condition:
+                condition.wait_for(changed, timeout)
+        finally:
+            with self._watch_lock:
+                condition, waiters = self._watchers[id]
+                if waiters > 1:
+                    self._watchers[id] = (condition, waiters - 1)
+                else:
+                    del self._watchers[id]
+        return self.get_status_snapshot(id)
+    
     def get_status(self, id):
-        for response in self.waitlist:
-            if response.id == id:
-                return response.stage
-        return "not found"
+        status = self.get_status_snapshot(id)
+        return status.stage if status is not None else "not found"
     
     def get_response(self, id):
-        for response in self.waitlist:
-            if response.id == id:
-                if response.stage == "done_processing":
-                    return response.ai_response
-                else:
-                    return "processing"
-        return "not found"
+        response = self._index.get(id)
+        if response is not None:
+            return response.ai_response if response.status.stage == "done_processing" else "processing"
+        record = None
+        if self.persistence == "sqlite":
+            record = self.database.get_ai_response(id)
+        if record is None:
+            archived = self.archive.get_record(id)
+            if archived is not None:
+                record = (archived["stage"], archived["ai_response"])
+        if record is None:
+            return "not found"
+        stage, ai_response = record
+        return ai_response if stage == "done_processing" else "processing"
+    
+    def get_timeline(self, id):
+        """Get the recorded stage transitions of a request, or None if it does not exist"""
+        response = self._index.get(id)
+        if response is not None:
+            return response.timeline
+        record = None
+        if self.persistence == "sqlite":
+            record = self.database.get_timeline(id)
+        if record is None:
+            record = self.archive.get_index_entry(id)
+        if record is None:
+            return None
+        return AIResponse.timeline_from_record(record)
+    
+    def load_request(self, id):
+        """Get the live AIResponse for a request, loading it from the database if needed"""
+        response = self._index.get(id)
+        if response is not None or self.persistence != "sqlite":
+            return response
+        record = self.database.get_record(id)
+        if record is None:
+            return None
+        response = AIResponse.from_dict(record, self.timetable_store)
+        response.on_update = self._on_response_update
+        with self._membership_lock:
+            if id in self._index:
+                return self._index[id]
+            self.waitlist.append(response)
+            self._index_add(response)
+        return response
+    
+    def release_request(self, response):
+        """Stop holding a request in memory once another worker owns its next stage"""
+        with self._membership_lock:
+            self.waitlist = [r for r in self.waitlist if r is not response]
+            self._index_remove(response)
+    
+    def get_request_history(self, email, before=None, limit=20):
+        """
+        Get summaries of every request submitted with an email address, newest first
+        
+        Args:
+            email: Email address, matched case-insensitively
+            before: ISO timestamp cursor; only requests created before it are returned
+            limit: Maximum number of summaries to return
+        
+        Returns:
+            List of request summaries as from AIResponse.to_summary()
+        """
+        key = email.strip().lower()
+        summaries = {}
+        for summary in self.archive.get_summaries_by_email(key, before):
+            summaries[summary["id"]] = summary
+        if self.persistence == "sqlite":
+            for summary in self.database.get_summaries_by_email(key, before, limit):
+                summaries[summary["id"]] = summary
+        # Live requests override stored copies that may not be flushed yet
+        for id in tuple(self._email_members.get(key, ())):
+            response = self._index.get(id)
+            if response is not None:
+                summary = response.to_summary()
+                if before is None or summary["created_at"] < before:
+                    summaries[summary["id"]] = summary
+        return sorted(summaries.values(), key=lambda s: s["created_at"] or "", reverse=True)[:limit]
+    
+    def get_stage_counts(self):
+        """Get the number of requests in each stage"""
+        if self.persistence == "sqlite":
+            return self.database.count_by_stage()
+        return {stage: len(ids) for stage, ids in list(self._stage_members.items()) if ids}
+    
+    def _recent_completion_times(self):
+        """Get the epoch times of requests completed within the stats completion window"""
+        cutoff = datetime.now() - timedelta(seconds=WaitListStats.COMPLETION_WINDOW_SECONDS)
+        if self.persistence == "sqlite":
+            return [datetime.fromisoformat(updated_at).timestamp()
+                    for updated_at in self.database.get_update_times("done_processing", cutoff.isoformat())]
+        return [r.updated_at.timestamp() for r in self.get_requests_in_stage("done_processing")
+                if r.updated_at >= cutoff]
+    
+    def get_live_counts(self):
+        """Get requests per stage, queued, in-flight and completed in the last hour from the live counters"""
+        if not self.shared_store:
+            counts = self.stats.get_counts()
+        else:
+            # Other processes move requests between stages and complete them without this one seeing it
+            self.stats.resync(self.database.count_by_stage())
+            counts = self.stats.get_counts()
+            cutoff = datetime.now() - timedelta(seconds=WaitListStats.COMPLETION_WINDOW_SECONDS)
+            counts["completed_last_hour"] = self.database.count_updated_since("done_processing",
+                                                                              cutoff.isoformat())
+        counts["total_requests"] = sum(counts["stages"].values()) + self.archive.count()
+        return counts
+    
+    def get_timings(self):
+        """
+        Get the rolling timing averages used for completion estimates
+        
+        The leader records them as requests move through it; with a shared
+        store every process derives them from the timelines of the last
+        WaitListStats.SAMPLE_SIZE completions instead, so followers estimate too.
+        
+        Returns:
+            Dict like WaitListStats.get_timings(); in shared mode
+            ai_seconds_per_attempt and ai_attempts_per_request are None
+        """
+        if not self.shared_store:
+            return self.stats.get_timings()
+        with self._timings_lock:
+            read_at, timings = self._shared_timings
+            if timings is not None and time.time() - read_at < self.config.get("timings_refresh_seconds", 30):
+                return timings
+            samples = {"extraction_seconds_per_course": [], "ai_seconds_per_attempt": [],
+                       "ai_attempts_per_request": [], "ai_seconds_per_request": []}
+            for courses, timeline in self.database.get_recent_timelines("done_processing", WaitListStats.SAMPLE_SIZE):
+                extraction_seconds = AIResponse.stage_seconds(timeline, "extracting_courses")
+                if extraction_seconds is not None:
+                    samples["extraction_seconds_per_course"].append(extraction_seconds / max(len(courses or []), 1))
+                ai_seconds = AIResponse.stage_seconds(timeline, "ai_processing")
+                if ai_seconds is not None:
+                    samples["ai_seconds_per_request"].append(ai_seconds)
+            timings = WaitListStats.average(samples)
+            self._shared_timings = (time.time(), timings)
+            return timings
+    
+    def _get_queue_snapshot(self):
+        """Get (positions by request id, queued count, claimed count), re-reading the job queue when stale"""
+        with self._queue_lock:
+            read_at, positions, queued, claimed = self._queue_snapshot
+            if time.time() - read_at >= self.config.get("queue_refresh_seconds", 1):
+                ids = self.job_queue.get_queued_ids()
+                positions = {request_id: position for position, request_id in enumerate(ids, 1)}
+                queued, claimed = len(ids), self.job_queue.count("claimed")
+                self._queue_snapshot = (time.time(), positions, queued, claimed)
+            return positions, queued, claimed
+    
+    def get_queue_position(self, id, stage=None):
+        """
+        Get a request's place in the AI queue from a snapshot at most
+        queue_refresh_seconds old
+        
+        Args:
+            id: Request id
+            stage: The request's stage, if already known
+        
+        Returns:
+            1 for next in line, counting requests not enqueued yet as joining
+            the end; None once processing, finished or not found
+        """
+        if stage is None:
+            stage = self.get_status(id)
+        if stage is None or stage == "ai_processing" or stage in AIResponse.TERMINAL_STAGES:
+            return None
+        positions, queued, _ = self._get_queue_snapshot()
+        if stage == "courses_collected" and str(id) in positions:
+            return positions[str(id)]
+        # Not enqueued yet: it joins the end of the line once its courses are collected
+        return queued + 1
+    
+    def estimate_completion(self, id, status=None):
+        """
+        Estimate a request's place in the AI queue and its time to completion
+        
+        Built from get_timings(), assuming one request is processed by the AI
+        at a time. The time is None until the timings it needs have been
+        observed, and while the AI is on cooldown.
+        
+        Args:
+            id: Request id
+            status: The request's RequestStatus if the caller already has it
+        
+        Returns:
+            Dict with queue_position (1 is next; None once processing or
+            finished), eta_seconds and estimated_completion (UTC ISO time),
+            or None if the request does not exist
+        """
+        if status is None:
+            status = self.get_status_snapshot(id)
+        if status is None:
+            return None
+        estimate = {"queue_position": None, "eta_seconds": None, "estimated_completion": None}
+        if status.stage in AIResponse.TERMINAL_STAGES:
+            return estimate
+        
+        stage = status.stage
+        estimate["queue_position"] = self.get_queue_position(id, stage)
+        
+        timings = self.get_timings()
+        if self.get_processor_state()["on_waitlist"] or timings["ai_seconds_per_request"] is None:
+            return estimate
+        ai_seconds = timings["ai_seconds_per_request"]
+        # Time already spent in the current stage
+        elapsed = (datetime.now() - status.updated_at).total_seconds() if status.updated_at else 0
+        
+        if stage == "ai_processing":
+            remaining = ai_seconds - elapsed
+        else:
+            _, _, claimed = self._get_queue_snapshot()
+            ahead = estimate["queue_position"] - 1 + claimed
+            remaining = ai_seconds * (ahead + 1)
+            if stage in ("initiated", "extracting_courses"):
+                if timings["extraction_seconds_per_course"] is None:
+                    return estimate
+                response = self._index.get(id)
+                course_count = len(response.courses_requested or []) if response is not None else 1
+                remaining += max(timings["extraction_seconds_per_course"] * course_count - elapsed, 0)
+        
+        remaining = max(remaining, 0)
+        estimate["eta_seconds"] = round(remaining, 1)
+        estimate["estimated_completion"] = (datetime.now(timezone.utc) + timedelta(seconds=remaining)).isoformat()
+        return estimate
     
     def get_waitlist(self):
-        return self.waitlist
+        """Get a snapshot of the in-memory requests that is safe to iterate"""
+        return list(self.waitlist)
+    
+    def get_requests_in_stage(self, stage):
+        """Get in-memory AIResponse objects for every request in a stage"""
+        if self.persistence == "sqlite":
+            ids = self.database.get_ids_by_stage(stage)
+            responses = [self._index.get(UUID(id)) for id in ids]
+        else:
+            responses = [self._index.get(id) for id in tuple(self._stage_members.get(stage, ()))]
+        return [response for response in responses if response is not None]
+    
+    def save(self, response=None):
+        """
+        Persist the waitlist
+        
+        Args:
+            response: The request that changed. In journal and sqlite modes only this
+                record is written; without it the whole waitlist is written.
+        
+        With a commit window configured the write is handed to the background
+        flusher and this call returns immediately.
+        """
+        if self.flusher is not None:
+            self.flusher.request(response)
+        else:
+            self._write([response] if response is not None else [], response is None)
+    
+    def flush(self):
+        """Block until all pending saves have reached disk"""
+        if self.flusher is not None:
+            self.flusher.flush()
+    
+    def _write(self, responses, full):
+        """Write changed requests (or everything when full) to the configured store"""
+        with self._write_lock:
+            if self.persistence == "journal":
+                due = False
+                if responses:
+                    due = self.journal.append([r.to_json() for r in responses])
+                if full or due:
+                    records = list(self.waitlist)
+                    self.journal.compact([r.to_json() for r in records])
+                return
+            
+            if self.persistence == "sqlite":
+                changed = {r.id: r for r in responses}
+                if full:
+                    for r in list(self.waitlist):
+                        changed.setdefault(r.id, r)
+                self.database.upsert([r.to_dict() for r in changed.values()])
+                # Finished requests are served from the database from now on
+                finished = {r.id for r in responses if r.stage in AIResponse.TERMINAL_STAGES}
+                if finished:
+                    with self._membership_lock:
+                        self.waitlist = [r for r in self.waitlist if r.id not in finished]
+                        for id in finished:
+                            if id in self._index:
+                                self._index_remove(self._index[id])
+                return
+            
+            # Only records changed since the last save are re-encoded
+            records = list(self.waitlist)
+            encoded = "[" + ", ".join(r.to_json() for r in records) + "]"
+            waitlist_file = os.path.join(self.server_folder, "user_data.json")
+            # Per-process temp name, since several server processes may save to the same folder
+            temp_file = f"{waitlist_file}.{os.getpid()}.tmp"
+            with open(temp_file, "w") as f:
+                f.write(encoded)
+            os.replace(temp_file, waitlist_file)
+    
+    def apply_retention(self):
+        """Move finished requests older than retention_hours into the archive"""
+        retention_hours = self.config.get("retention_hours")
+        if retention_hours is None or not self.is_leader:
+            # With leader election only the lease holder archives the shared store
+            return 0
+        cutoff = datetime.now() - timedelta(hours=retention_hours)
+        
+        with self._membership_lock:
+            if self.persistence == "sqlite":
+                # Distributed workers share the store too; the first to take the lock archives each record
+                with self.archive.exclusive():
+                    records = self.database.get_records_updated_before(AIResponse.TERMINAL_STAGES,
+                                                                       cutoff.isoformat())
+                    if records:
+                        self.archive.archive(records)
+                        self.database.delete([record["id"] for record in records])
+                        self.stats.record_removed([record["stage"] for record in records])
+                expired_count = len(records)
+            else:
+                expired = []
+                for stage in AIResponse.TERMINAL_STAGES:
+                    for id in tuple(self._stage_members.get(stage, ())):
+                        response = self._index.get(id)
+                        if response is not None and response.updated_at < cutoff:
+                            expired.append(response)
+                if expired:
+                    # Archive first so a crash in between only leaves a duplicate, never a loss
+                    self.archive.archive([r.to_dict() for r in expired])
+                    expired_ids = {r.id for r in expired}
+                    self.waitlist = [r for r in self.waitlist if r.id not in expired_ids]
+                    for response in expired:
+                        self._index_remove(response)
+                    self.stats.record_removed([r.stage for r in expired])
+                expired_count = len(expired)
+        
+        if expired_count and self.persistence != "sqlite":
+            self.save()
+        
+        if expired_count:
+            print(f"Archived {expired_count} finished requests older than {retention_hours} hours")
+        return expired_count
     
-    def save(self):
-        with open(os.path.join(self.server_folder, "user_data.json"), "w") as f:
-            json.dump([response.to_dict() for response in self.waitlist], f)
+    def _start_retention(self):
+        """Start applying the retention policy in the background, if one is configured"""
+        if self.config.get("retention_hours") is not None and self._retention_thread is None:
+            self._retention_thread = threading.Thread(target=self._retention_loop, daemon=True)
+            self._retention_thread.start()
+    
+    def _retention_loop(self):
+        """Periodically apply the retention policy"""
+        interval = self.config.get("retention_check_minutes", 10) * 60
+        while True:
+            time.sleep(interval)
+            try:
+                self.apply_retention()
+            except Exception as e:
+                print(f"Error applying retention policy: {e}")
+    
+    def _on_response_update(self, response):
+        """Re-index and persist a request whenever its stage or result changes"""
+        with self._stripe(response.id):
+            if response.id in self._index:
+                previous = self._indexed_stage.get(response.id)
+                self._index_stage(response)
+                self.stats.record_transition(previous, response.status.stage)
+                if previous == "extracting_courses" and response.status.stage == "courses_collected":
+                    seconds = response.get_stage_seconds("extracting_courses")
+                    if seconds is not None:
+                        self.stats.record_extraction(seconds, len(response.courses_requested or []))
+        # Wake anyone streaming this request's progress
+        watcher = self._watchers.get(response.id)
+        if watcher is not None:
+            with watcher[0]:
+                watcher[0].notify_all()
+        self.save(response)
+        self.memory_manager.on_update(response)
+        self.ai_processor_thread.notify_stage_change(response)
+        if response.stage not in ("initiated", "extracting_courses"):
+            self._finish_extraction(response)
     
     def from_dict(self, data):
-        self.waitlist = [AIResponse.from_dict(response) for response in data]
+        with self._membership_lock:
+            self.waitlist = [AIResponse.from_dict(response, self.timetable_store) for response in data]
+            self._index = {}
+            self._stage_members = {stage: set() for stage in AIResponse.ACTIVE_STAGES + AIResponse.TERMINAL_STAGES}
+            self._indexed_stage = {}
+            self._email_members = {}
+            for response in self.waitlist:
+                response.on_update = self._on_response_update
+                self._index_add(response)
         return self
     
+    def get_memory_report(self):
+        """Get memory use of the request cache broken down by stage"""
+        return self.memory_manager.get_report()
+    
+    def get_debug_attempts(self, id, persist=False):
+        """
+        Get the captured AI attempts for a request
+        
+        Args:
+            id: Request id
+            persist: Also write attempts still only in memory to the request's debug file
+        """
+        debug_capture = self.ai_processor_thread.ai_processor.debug_capture
+        if persist:
+            debug_capture.persist(id)
+        return debug_capture.get_attempts(id)
+    
     def get_ai_processor_status(self):
         """Get the current status of the AI processor thread"""
         return self.ai_processor_thread.get_status()
@@ -71,15 +844,47 @@ class WaitList:
         """Stop the AI processor thread"""
         self.ai_processor_thread.stop()
     
+    def close(self):
+        """Stop processing, write pending saves and give up this process's hold on the server folder"""
+        self.ai_processor_thread.stop()
+        self.flush()
+        if self._store_lease is not None:
+            self._store_lease.release()
+        if self.lease is not None:
+            self.lease.release()
+    
     def restart_ai_processor(self):
         """Restart the AI processor thread"""
         self.ai_processor_thread.stop()
-        self.ai_processor_thread.start()
+        if self.is_leader:
+            self.ai_processor_thread.start()
     
     def get_queue_size(self):
         """Get the current size of the AI processing queue"""
         return self.ai_processor_thread.get_queue_size()
     
     def is_ai_processing(self):
-        """Check if the AI processor is currently processing requests"""
-        return self.ai_processor_thread.is_processing()
\ No newline at end of file
+        """Check if the AI processor is currently processing requests, wherever it runs"""
+        return self.get_processor_state()["processing"]
+    
+    def publish_processor_state(self, state):
+        """Share the state of this process's AI processor with processes sharing the store"""
+        if self.shared_store:
+            self.database.put_state("ai_processor", state, datetime.now().isoformat())
+    
+    def get_processor_state(self):
+        """
+        Get the AI processor's on_waitlist, on_cooldown and processing flags
+        
+        A process running the AI processor reports its own; the others read
+        what the lease holder last published to the shared store.
+        """
+        if not self.shared_store or self.ai_processor_thread.running:
+            return self.ai_processor_thread.state
+        with self._processor_state_lock:
+            read_at, state = self._processor_state
+            if state is None or time.time() - read_at >= self.config.get("processor_state_refresh_seconds", 1):
+                state = self.database.get_state("ai_processor") or {
+                    "on_waitlist": False, "on_cooldown": False, "processing": False}
+                self._processor_state = (time.time(), state)
+            return state
\ No newline at end of file
@@ -0,0 +1,275 @@
+import os
+import json
+import sqlite3
+import threading
+
+
+class WaitListDatabase:
+    def __init__(self, server_folder):
+        """
+        SQLite store for AIResponse records
+
+        Args:
+            server_folder: Folder holding user_data.db
+        """
+        self.db_file = os.path.join(server_folder, "user_data.db")
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.db_file, check_same_thread=False, timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        # WAL lets other worker processes read while one of them writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the requests and state tables and their indexes if they do not exist"""
+        with self._lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS requests (
+                    id TEXT PRIMARY KEY,
+                    stage TEXT,
+                    email TEXT,
+                    semester TEXT,
+                    courses_requested TEXT,
+                    preferences TEXT,
+                    course_timetable TEXT,
+                    ai_response TEXT,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    timeline TEXT
+                )
+            """)
+            columns = [row["name"] for row in self.connection.execute("PRAGMA table_info(requests)")]
+            if "timeline" not in columns:
+                # Databases created before per-request timelines were stored
+                self.connection.execute("ALTER TABLE requests ADD COLUMN timeline TEXT")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_requests_stage ON requests (stage)")
+            # Most recently updated requests in a stage, e.g. completions for timing estimates
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_requests_stage_updated ON requests (stage, updated_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_requests_email ON requests (email)")
+            # Case-insensitive history lookups, newest first
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_requests_email_created ON requests (email COLLATE NOCASE, created_at)")
+            # Small JSON values published by one process for the others, e.g. the AI processor state
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS state (
+                    name TEXT PRIMARY KEY,
+                    value TEXT,
+                    updated_at TEXT
+                )
+            """)
+
+    def _to_row(self, record):
+        """Flatten a record from AIResponse.to_dict() into column values"""
+        return (
+            record["id"],
+            record.get("stage"),
+            record.get("email"),
+            record.get("semester"),
+            json.dumps(record.get("courses_requested")),
+            json.dumps(record.get("preferences")),
+            json.dumps(record.get("course_timetable")),
+            json.dumps(record.get("ai_response")),
+            record.get("created_at"),
+            record.get("updated_at"),
+            json.dumps(record.get("timeline"))
+        )
+
+    def _from_row(self, row):
+        """Rebuild a record in AIResponse.to_dict() format from a row"""
+        return {
+            "id": row["id"],
+            "stage": row["stage"],
+            "email": row["email"],
+            "semester": row["semester"],
+            "courses_requested": json.loads(row["courses_requested"]),
+            "preferences": json.loads(row["preferences"]),
+            "course_timetable": json.loads(row["course_timetable"]),
+            "ai_response": json.loads(row["ai_response"]),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "timeline": json.loads(row["timeline"]) if row["timeline"] else None
+        }
+
+    def upsert(self, records):
+        """Insert or replace one or more records in a single transaction"""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO requests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._to_row(record) for record in records]
+            )
+
+    def put_state(self, name, value, updated_at):
+        """Publish a JSON-serializable value under a name, replacing any earlier one"""
+        with self._lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO state VALUES (?, ?, ?)",
+                                    (name, json.dumps(value), updated_at))
+
+    def get_state(self, name):
+        """Get a value published with put_state(), or None if there is none"""
+        with self._lock:
+            row = self.connection.execute("SELECT value FROM state WHERE name = ?", (name,)).fetchone()
+        return json.loads(row["value"]) if row else None
+
+    def is_empty(self):
+        """Check whether the database holds no requests yet"""
+        with self._lock:
+            return self.connection.execute("SELECT 1 FROM requests LIMIT 1").fetchone() is None
+
+    def import_json(self, json_file):
+        """Import records from a user_data.json snapshot"""
+        with open(json_file, 'r') as f:
+            records = json.load(f)
+        self.upsert(records)
+        print(f"Imported {len(records)} requests from {json_file}")
+        return len(records)
+
+    def get_record(self, id):
+        """Get a full record by request id, or None if it does not exist"""
+        with self._lock:
+            row = self.connection.execute("SELECT * FROM requests WHERE id = ?", (str(id),)).fetchone()
+        return self._from_row(row) if row else None
+
+    def get_status(self, id):
+        """Get the stage and last update time of a request, or None if it does not exist"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT stage, updated_at FROM requests WHERE id = ?", (str(id),)).fetchone()
+        return (row["stage"], row["updated_at"]) if row else None
+
+    def get_statuses(self, ids):
+        """Get the stage and last update time of several requests in one query, keyed by id string"""
+        ids = [str(id) for id in ids]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT id, stage, updated_at FROM requests WHERE id IN ({placeholders})", ids).fetchall()
+        return {row["id"]: (row["stage"], row["updated_at"]) for row in rows}
+
+    def get_timeline(self, id):
+        """Get the stage, timestamps and stored timeline of a request, or None if it does not exist"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT stage, created_at, updated_at, timeline FROM requests WHERE id = ?", (str(id),)).fetchone()
+        if row is None:
+            return None
+        return {
+            "stage": row["stage"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "timeline": json.loads(row["timeline"]) if row["timeline"] else None
+        }
+
+    def get_ai_response(self, id):
+        """Get the stage and AI result of a request, or None if it does not exist"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT stage, ai_response FROM requests WHERE id = ?", (str(id),)).fetchone()
+        if row is None:
+            return None
+        return row["stage"], json.loads(row["ai_response"])
+
+    def get_ids_by_stage(self, stage):
+        """Get ids of all requests currently in a stage"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id FROM requests WHERE stage = ? ORDER BY created_at", (stage,)).fetchall()
+        return [row["id"] for row in rows]
+
+    def get_summaries_by_email(self, email, before=None, limit=20):
+        """
+        Get compact summaries of a user's requests, newest first
+
+        Args:
+            email: Email address, matched case-insensitively
+            before: Only include requests created before this ISO timestamp
+            limit: Maximum number of summaries to return
+        """
+        query = ("SELECT id, stage, semester, courses_requested, preferences, created_at, updated_at "
+                 "FROM requests WHERE email = ? COLLATE NOCASE")
+        params = [email]
+        if before is not None:
+            query += " AND created_at < ?"
+            params.append(before)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [{
+            "id": row["id"],
+            "stage": row["stage"],
+            "semester": row["semester"],
+            "courses_requested": json.loads(row["courses_requested"]),
+            "preferences": json.loads(row["preferences"]),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        } for row in rows]
+
+    def get_records_by_stage(self, stages):
+        """Get full records for every request in any of the given stages"""
+        placeholders = ", ".join("?" for _ in stages)
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM requests WHERE stage IN ({placeholders}) ORDER BY created_at",
+                list(stages)).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def get_records_updated_before(self, stages, cutoff):
+        """Get full records in the given stages last updated before an ISO timestamp"""
+        placeholders = ", ".join("?" for _ in stages)
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM requests WHERE stage IN ({placeholders}) AND updated_at < ?",
+                list(stages) + [cutoff]).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def get_update_times(self, stage, since):
+        """Get the updated_at ISO timestamps of requests in a stage updated at or after since"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT updated_at FROM requests WHERE stage = ? AND updated_at >= ?", (stage, since)).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, ids):
+        """Delete requests by id in a single transaction"""
+        with self._lock, self.connection:
+            self.connection.executemany("DELETE FROM requests WHERE id = ?", [(str(id),) for id in ids])
+
+    def count(self, stage=None):
+        """Count all requests, or only those in a given stage"""
+        with self._lock:
+            if stage is None:
+                row = self.connection.execute("SELECT COUNT(*) FROM requests").fetchone()
+            else:
+                row = self.connection.execute(
+                    "SELECT COUNT(*) FROM requests WHERE stage = ?", (stage,)).fetchone()
+        return row[0]
+
+    def get_recent_timelines(self, stage, limit):
+        """Get (courses_requested, timeline) of the requests in a stage updated most recently"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT courses_requested, timeline FROM requests WHERE stage = ? AND timeline IS NOT NULL "
+                "ORDER BY updated_at DESC LIMIT ?", (stage, limit)).fetchall()
+        return [(json.loads(row["courses_requested"]), json.loads(row["timeline"])) for row in rows]
+
+    def count_updated_since(self, stage, since):
+        """Count requests in a stage last updated at or after an ISO timestamp"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT COUNT(*) FROM requests WHERE stage = ? AND updated_at >= ?", (stage, since)).fetchone()
+        return row[0]
+
+    def count_by_stage(self):
+        """Count requests in each stage using the stage index"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT stage, COUNT(*) FROM requests GROUP BY stage").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.connection.close()
@@ -0,0 +1,87 @@
+import time
+import threading
+
+
+class WaitListFlusher:
+    def __init__(self, write_callback, commit_window=0.05):
+        """
+        Background writer that coalesces WaitList saves into group commits
+
+        Save requests arriving within commit_window seconds of each other are
+        written together by a single call to write_callback, so callers never
+        wait on disk I/O.
+
+        Args:
+            write_callback: Called as write_callback(responses, full) from the writer thread,
+                where responses are the changed requests and full asks for a complete rewrite
+            commit_window: Seconds to wait for more save requests before writing
+        """
+        self.write_callback = write_callback
+        self.commit_window = commit_window
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._full = False
+        self._requested = 0
+        self._written = 0
+        self._flush_now = False
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def request(self, response=None):
+        """Queue a save of one changed request, or of everything when response is None"""
+        with self._condition:
+            if response is None:
+                self._full = True
+            else:
+                self._pending[response.id] = response
+            self._requested += 1
+            self._condition.notify_all()
+
+    def flush(self, timeout=30):
+        """Block until every save requested before this call has been written"""
+        with self._condition:
+            target = self._requested
+            if self._written >= target:
+                return True
+            self._flush_now = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._written >= target, timeout=timeout)
+
+    def stop(self):
+        """Write anything still pending and stop the writer thread"""
+        self.flush()
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+        self.thread.join(timeout=5)
+
+    def _run(self):
+        """Writer loop: wait for a save request, let the window fill, then write once"""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._requested > self._written or not self.running)
+                if not self.running and self._requested == self._written:
+                    return
+                flush_now = self._flush_now
+
+            # Let other saves within the commit window join this write
+            if not flush_now:
+                time.sleep(self.commit_window)
+
+            with self._condition:
+                responses = list(self._pending.values())
+                full = self._full
+                target = self._requested
+                self._pending = {}
+                self._full = False
+                self._flush_now = False
+
+            try:
+                self.write_callback(responses, full)
+            except Exception as e:
+                print(f"Error writing waitlist: {e}")
+
+            with self._condition:
+                self._written = target
+                self._condition.notify_all()
@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+
+
+class WaitListJournal:
+    def __init__(self, server_folder, compact_every=500):
+        """
+        Append-only journal of waitlist mutations folded into a snapshot
+
+        A compacted journal starts with a header naming the SHA-1 of the
+        snapshot it extends. If a crash leaves a new snapshot next to the
+        journal it already covers, the header no longer matches and the
+        journal is skipped instead of replayed over newer records.
+
+        Args:
+            server_folder: Folder holding user_data.json and user_data.journal
+            compact_every: Number of journal records to accept before compacting
+        """
+        self.snapshot_file = os.path.join(server_folder, "user_data.json")
+        self.journal_file = os.path.join(server_folder, "user_data.journal")
+        self.compact_every = compact_every
+        self.records_since_compaction = 0
+
+    def load(self):
+        """Replay the snapshot followed by the journal and return the merged records"""
+        records = {}
+
+        snapshot_digest = None
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'rb') as f:
+                content = f.read()
+            snapshot_digest = hashlib.sha1(content).hexdigest()
+            for record in json.loads(content):
+                records[record["id"]] = record
+
+        self.records_since_compaction = 0
+        if not os.path.exists(self.journal_file):
+            # Even the journal before the first compaction names the snapshot it extends, if any
+            self._start_journal(snapshot_digest)
+        else:
+            with open(self.journal_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-append carries no usable data
+                        print("Skipping unreadable journal record")
+                        continue
+                    if entry.get("op") == "base":
+                        if snapshot_digest is not None and entry.get("snapshot") != snapshot_digest:
+                            # Compaction stopped after replacing the snapshot; it already holds all of this
+                            print("Skipping journal already folded into the snapshot")
+                            self._start_journal(snapshot_digest)
+                            break
+                        continue
+                    if entry.get("op") == "put":
+                        records[entry["record"]["id"]] = entry["record"]
+                    self.records_since_compaction += 1
+
+        return list(records.values())
+
+    def append(self, encoded_records):
+        """
+        Append record mutations to the journal in a single write
+
+        Args:
+            encoded_records: JSON encodings of the changed records, as from AIResponse.to_json()
+
+        Returns:
+            True when enough records have accumulated that a compaction is due
+        """
+        with open(self.journal_file, 'a') as f:
+            f.write("".join('{"op": "put", "record": ' + encoded + "}\n" for encoded in encoded_records))
+        self.records_since_compaction += len(encoded_records)
+        return self.records_since_compaction >= self.compact_every
+
+    def compact(self, encoded_records):
+        """
+        Write a fresh snapshot of all records and truncate the journal
+
+        Args:
+            encoded_records: JSON encodings of every record, as from AIResponse.to_json()
+        """
+        content = ("[" + ", ".join(encoded_records) + "]").encode("utf-8")
+        temp_file = self.snapshot_file + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(content)
+        os.replace(temp_file, self.snapshot_file)
+
+        # The snapshot now covers everything in the journal
+        self._start_journal(hashlib.sha1(content).hexdigest())
+        self.records_since_compaction = 0
+
+    def _start_journal(self, snapshot_digest):
+        """Atomically replace the journal with an empty one extending the snapshot with this digest"""
+        temp_file = self.journal_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            f.write(json.dumps({"op": "base", "snapshot": snapshot_digest}) + "\n")
+        os.replace(temp_file, self.journal_file)
@@ -0,0 +1,113 @@
+import time
+import threading
+from collections import deque
+
+
+class WaitListStats:
+    # Completions are counted over this many trailing seconds
+    COMPLETION_WINDOW_SECONDS = 3600
+    # Number of recent samples each rolling timing average is taken over
+    SAMPLE_SIZE = 100
+
+    def __init__(self, stage_counts=None, completion_times=None):
+        """
+        Live request counters and rolling stage timings
+
+        Holds the number of requests in each stage and the times of recent
+        completions, so status endpoints never scan the waitlist or query
+        the store. The counts reflect the transitions this process sees;
+        when other processes share the store, resync() them from it. Rolling
+        averages over the last SAMPLE_SIZE extractions and AI runs feed
+        completion estimates.
+
+        Args:
+            stage_counts: Number of requests in each stage at startup
+            completion_times: Epoch times of requests completed within the window
+        """
+        self._lock = threading.Lock()
+        self._stage_counts = dict(stage_counts or {})
+        self._completions = deque(sorted(completion_times or []))
+        self._extraction_seconds_per_course = deque(maxlen=self.SAMPLE_SIZE)
+        self._ai_seconds_per_attempt = deque(maxlen=self.SAMPLE_SIZE)
+        self._ai_attempts_per_request = deque(maxlen=self.SAMPLE_SIZE)
+        self._ai_seconds_per_request = deque(maxlen=self.SAMPLE_SIZE)
+
+    def record_transition(self, previous, stage):
+        """Move one request from its previous stage (None when new) to its current one"""
+        if previous == stage:
+            return
+        with self._lock:
+            if previous is not None:
+                self._stage_counts[previous] = max(self._stage_counts.get(previous, 0) - 1, 0)
+            self._stage_counts[stage] = self._stage_counts.get(stage, 0) + 1
+            if stage == "done_processing":
+                self._completions.append(time.time())
+
+    def record_extraction(self, seconds, course_count):
+        """Add the duration of one course extraction"""
+        with self._lock:
+            self._extraction_seconds_per_course.append(seconds / max(course_count, 1))
+
+    def record_ai(self, seconds, attempts):
+        """Add the duration and attempt count of one AI run; runs without attempts are ignored"""
+        if attempts <= 0:
+            return
+        with self._lock:
+            self._ai_seconds_per_attempt.append(seconds / attempts)
+            self._ai_attempts_per_request.append(attempts)
+            self._ai_seconds_per_request.append(seconds)
+
+    def record_removed(self, stages):
+        """Drop requests that left the store, e.g. into the archive, given their stages"""
+        with self._lock:
+            for stage in stages:
+                self._stage_counts[stage] = max(self._stage_counts.get(stage, 0) - 1, 0)
+
+    def resync(self, stage_counts):
+        """Replace the stage counts with ones read from the shared store"""
+        with self._lock:
+            self._stage_counts = dict(stage_counts)
+
+    def get_counts(self):
+        """
+        Get the current counters
+
+        Returns:
+            Dict with requests per stage, queued (waiting for the AI),
+            in_flight (being processed by the AI) and completed_last_hour
+        """
+        cutoff = time.time() - self.COMPLETION_WINDOW_SECONDS
+        with self._lock:
+            while self._completions and self._completions[0] < cutoff:
+                self._completions.popleft()
+            stages = {stage: count for stage, count in self._stage_counts.items() if count}
+            completed = len(self._completions)
+        return {
+            "stages": stages,
+            "queued": stages.get("courses_collected", 0),
+            "in_flight": stages.get("ai_processing", 0),
+            "completed_last_hour": completed
+        }
+
+    def get_timings(self):
+        """
+        Get the rolling timing averages
+
+        Returns:
+            Dict with extraction_seconds_per_course, ai_seconds_per_attempt,
+            ai_attempts_per_request and ai_seconds_per_request, each None
+            until first sampled
+        """
+        with self._lock:
+            samples = {
+                "extraction_seconds_per_course": list(self._extraction_seconds_per_course),
+                "ai_seconds_per_attempt": list(self._ai_seconds_per_attempt),
+                "ai_attempts_per_request": list(self._ai_attempts_per_request),
+                "ai_seconds_per_request": list(self._ai_seconds_per_request)
+            }
+        return self.average(samples)
+
+    @staticmethod
+    def average(samples):
+        """Average each named list of samples, giving None for empty ones"""
+        return {name: sum(values) / len(values) if values else None for name, values in samples.items()}
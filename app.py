@@ -3,7 +3,7 @@ import json
 import time
 import uuid
 from datetime import datetime, timezone
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 import threading
 import logging
@@ -32,16 +32,35 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Progress streams hold a server thread for as long as they stay open, so they are only
+# offered with "event_streams": true in the AI config, on a threaded or async worker class.
+# Seconds between checks for changes made by other processes, between keepalive
+# comments, and before the stream closes for the client to reconnect
+SSE_POLL_SECONDS = 2
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_SECONDS = 600
+# Largest number of request ids accepted by the batch status endpoint
+MAX_BATCH_STATUS_IDS = 100
+# /api/waitlist_status serves a snapshot rebuilt at most this often
+WAITLIST_STATUS_CACHE_SECONDS = 1
+# Bounds of the polling interval suggested to clients from a request's estimated wait
+MIN_POLL_SECONDS = 2
+MAX_POLL_SECONDS = 30
+DEFAULT_POLL_SECONDS = 3
+
 # Global variables
 waitlist = None
 ai_processor = None
+waitlist_status_cache = {'built_at': 0, 'status': None}
+waitlist_status_lock = threading.Lock()
+event_streams_enabled = False
 server_folder = "server_data"
 config_file = None
 admin_credentials = None
 
 def initialize_server():
     """Initialize the server with waitlist and AI processor"""
-    global waitlist, ai_processor, config_file
+    global waitlist, ai_processor, config_file, event_streams_enabled
     
     # Create server folder if it doesn't exist
     if not os.path.exists(server_folder):
@@ -59,6 +78,8 @@ def initialize_server():
     # Initialize AI processor with config
     ai_processor = AIProcessor(ai_config)
     
+    event_streams_enabled = bool(ai_config.get("event_streams", False))
+    
     logger.info("Server initialized successfully")
 
 def load_admin_credentials():
@@ -159,32 +180,9 @@ def load_ai_config():
 
 def log_waitlist_event(event, data=None):
     """Log events to waitlist logs"""
-    log_entry = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "event": event,
-        "data": data or {}
-    }
-    
-    log_file = os.path.join(server_folder, "server_logs.json")
-    
-    # Load existing logs
-    if os.path.exists(log_file):
-        with open(log_file, 'r') as f:
-            logs = json.load(f)
-    else:
-        logs = []
-    
-    # Add new log entry
-    logs.append(log_entry)
-    
-    # Keep only last 1000 entries
-    if len(logs) > 1000:
-        logs = logs[-1000:]
-    
-    # Save logs
-    with open(log_file, 'w') as f:
-        json.dump(logs, f, indent=2)
-    
+    if waitlist is None:
+        return
+    waitlist.event_log.log(event, data)
     logger.info(f"Waitlist event logged: {event}")
 
 def convert_to_24hr(time_str):
@@ -317,8 +315,8 @@ def submit_request():
         if not courses:
             return jsonify({'error': 'No courses provided'}), 400
         
-        # Check if server is in cooldown mode
-        if waitlist.is_ai_processing() and ai_processor._should_wait_for_cooldown():
+        # Check if server is in cooldown mode, which the lease holder shares with every worker
+        if waitlist.get_processor_state()['on_cooldown']:
             log_waitlist_event("request_rejected_cooldown", {
                 "email": email,
                 "courses_count": len(courses)
@@ -342,7 +340,8 @@ def submit_request():
         return jsonify({
             'request_id': str(request_id),
             'status': 'submitted',
-            'message': 'Request submitted successfully. You can check status at /schedule/' + str(request_id)
+            'message': 'Request submitted successfully. You can check status at /schedule/' + str(request_id),
+            'estimate': get_request_estimate(request_id)
         }), 200
         
     except Exception as e:
@@ -358,17 +357,22 @@ def get_schedule_status(request_id):
         request_uuid = uuid.UUID(request_id)
         
         # Get status from waitlist
-        status = waitlist.get_status(request_uuid)
+        snapshot = waitlist.get_status_snapshot(request_uuid)
         
-        if status == "not found":
+        if snapshot is None:
             return jsonify({'error': 'Request not found'}), 404
+        status = snapshot.stage
         
-        # Get response data
-        response_data = waitlist.get_response(request_uuid)
+        # Unchanged since the client's copy: skip building the payload altogether
+        etag = schedule_etag(request_id, snapshot, waitlist.get_queue_position(request_uuid, status))
+        if etag in request.if_none_match:
+            return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+        estimate = get_request_estimate(request_uuid, snapshot)
         
         # Check if server is in cooldown mode
-        cooldown_mode = ai_processor._should_wait_for_cooldown() if ai_processor else False
-        waitlist_mode = waitlist.on_waitlist if waitlist else False
+        processor_state = waitlist.get_processor_state()
+        cooldown_mode = processor_state['on_cooldown']
+        waitlist_mode = processor_state['on_waitlist']
         
         result = {
             'request_id': request_id,
@@ -379,56 +383,19 @@ def get_schedule_status(request_id):
         }
         
         # Add progress information
-        if status == "initiated":
-            result['progress'] = {
-                'stage': 'Request submitted',
-                'percentage': 10,
-                'message': 'Your request has been submitted and is queued for processing.'
-            }
-        elif status == "extracting_courses":
-            result['progress'] = {
-                'stage': 'Fetching course data',
-                'percentage': 30,
-                'message': 'Fetching course information from Virginia Tech database...'
-            }
-        elif status == "courses_collected":
-            result['progress'] = {
-                'stage': 'Course data collected',
-                'percentage': 50,
-                'message': 'Course data has been collected. Starting AI processing...'
-            }
-        elif status == "ai_processing":
-            result['progress'] = {
-                'stage': 'AI processing',
-                'percentage': 80,
-                'message': 'AI is generating your optimal schedule...'
-            }
-        elif status == "done_processing":
-            result['progress'] = {
-                'stage': 'Complete',
-                'percentage': 100,
-                'message': 'Your schedule has been generated successfully!'
-            }
-            result['schedule'] = response_data
-        elif status == "extraction_failed":
-            result['progress'] = {
-                'stage': 'Failed',
-                'percentage': 0,
-                'message': 'Failed to fetch course data. Please try again.'
-            }
-            result['error'] = 'Course data extraction failed'
-        elif status == "ai_failed":
-            result['progress'] = {
-                'stage': 'Failed',
-                'percentage': 0,
-                'message': 'AI processing failed. Please try again.'
-            }
-            result['error'] = 'AI processing failed'
+        result.update(describe_stage(request_id, request_uuid, status))
+        result['estimate'] = estimate
+        if event_streams_enabled and status not in AIResponse.TERMINAL_STAGES:
+            result['events_url'] = f'/api/schedule/{request_id}/events'
         
         # Add timeline information
         result['timeline'] = get_request_timeline(request_uuid)
         
-        return jsonify(result), 200
+        response = jsonify(result)
+        response.set_etag(etag)
+        # Clients may keep the payload but must revalidate it on every poll
+        response.headers['Cache-Control'] = 'no-cache'
+        return response, 200
         
     except ValueError:
         return jsonify({'error': 'Invalid request ID format'}), 400
@@ -436,48 +403,278 @@ def get_schedule_status(request_id):
         logger.error(f"Error getting schedule status: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Progress shown for each stage, and the error reported for failed stages
+STAGE_PROGRESS = {
+    'initiated': {
+        'stage': 'Request submitted',
+        'percentage': 10,
+        'message': 'Your request has been submitted and is queued for processing.'
+    },
+    'extracting_courses': {
+        'stage': 'Fetching course data',
+        'percentage': 30,
+        'message': 'Fetching course information from Virginia Tech database...'
+    },
+    'courses_collected': {
+        'stage': 'Course data collected',
+        'percentage': 50,
+        'message': 'Course data has been collected. Starting AI processing...'
+    },
+    'ai_processing': {
+        'stage': 'AI processing',
+        'percentage': 80,
+        'message': 'AI is generating your optimal schedule...'
+    },
+    'done_processing': {
+        'stage': 'Complete',
+        'percentage': 100,
+        'message': 'Your schedule has been generated successfully!'
+    },
+    'extraction_failed': {
+        'stage': 'Failed',
+        'percentage': 0,
+        'message': 'Failed to fetch course data. Please try again.'
+    },
+    'ai_failed': {
+        'stage': 'Failed',
+        'percentage': 0,
+        'message': 'AI processing failed. Please try again.'
+    }
+}
+STAGE_ERRORS = {
+    'extraction_failed': 'Course data extraction failed',
+    'ai_failed': 'AI processing failed'
+}
+
+def describe_stage(request_id, request_uuid, status, include_result=True):
+    """Get the progress fields of a status payload, with the schedule once it is done"""
+    fields = {}
+    if status in STAGE_PROGRESS:
+        fields['progress'] = dict(STAGE_PROGRESS[status])
+    if status == "done_processing":
+        if include_result:
+            fields['schedule'] = waitlist.get_response(request_uuid)
+        fields['result_url'] = f'/api/schedule/{request_id}/result'
+    if status in STAGE_ERRORS:
+        fields['error'] = STAGE_ERRORS[status]
+    return fields
+
+def get_request_estimate(request_uuid, snapshot=None):
+    """
+    Get a request's queue position and estimated completion, with a suggested
+    polling interval; pass the request's snapshot when already read
+    """
+    estimate = waitlist.estimate_completion(request_uuid, snapshot)
+    if estimate is None:
+        return None
+    if estimate['eta_seconds'] is None:
+        estimate['poll_after_seconds'] = DEFAULT_POLL_SECONDS
+    else:
+        # Poll a few times over the predicted wait rather than at a fixed rate
+        estimate['poll_after_seconds'] = round(
+            min(max(estimate['eta_seconds'] / 4, MIN_POLL_SECONDS), MAX_POLL_SECONDS), 1)
+    return estimate
+
+def schedule_etag(request_id, snapshot, queue_position=None):
+    """
+    Version of a request's status payload: changes with its stage, its last
+    update, its queue position and the waitlist mode, which stands in for
+    the cooldown state. Built from in-memory state only, so a 304 never
+    touches the store or the job queue
+    """
+    updated_at = snapshot.updated_at.isoformat() if snapshot.updated_at else ''
+    on_waitlist = waitlist.get_processor_state()['on_waitlist']
+    key = f"{request_id}|{snapshot.stage}|{updated_at}|{queue_position}|{on_waitlist}|{event_streams_enabled}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+@app.route('/api/schedule/<request_id>/result', methods=['GET'])
+def get_schedule_result(request_id):
+    """Get a finished schedule; it never changes, so it is served as immutable"""
+    try:
+        request_uuid = uuid.UUID(request_id)
+        
+        if waitlist.get_status(request_uuid) != "done_processing":
+            return jsonify({'error': 'Schedule not ready or not found'}), 404, {'Cache-Control': 'no-store'}
+        
+        response = jsonify({'request_id': request_id, 'schedule': waitlist.get_response(request_uuid)})
+        response.set_etag(hashlib.sha1(request_id.encode('utf-8')).hexdigest())
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response, 200
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid request ID format'}), 400
+    except Exception as e:
+        logger.error(f"Error getting schedule result: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/schedules/status', methods=['POST'])
+def get_schedule_statuses():
+    """Get the status of several schedule requests in one round trip"""
+    try:
+        data = request.get_json(silent=True) or {}
+        request_ids = data.get('request_ids')
+        include_result = bool(data.get('include_result', False))
+        
+        if not isinstance(request_ids, list) or not request_ids:
+            return jsonify({'error': 'request_ids must be a non-empty list'}), 400
+        if len(request_ids) > MAX_BATCH_STATUS_IDS:
+            return jsonify({'error': f'At most {MAX_BATCH_STATUS_IDS} request ids per call'}), 400
+        
+        uuids = {}
+        for request_id in request_ids:
+            try:
+                uuids[str(request_id)] = uuid.UUID(str(request_id))
+            except ValueError:
+                pass
+        snapshots = waitlist.get_status_snapshots(set(uuids.values()))
+        
+        statuses = []
+        for request_id in request_ids:
+            request_id = str(request_id)
+            request_uuid = uuids.get(request_id)
+            if request_uuid is None:
+                statuses.append({'request_id': request_id, 'error': 'Invalid request ID format'})
+                continue
+            snapshot = snapshots.get(request_uuid)
+            if snapshot is None:
+                statuses.append({'request_id': request_id, 'error': 'Request not found'})
+                continue
+            entry = {
+                'request_id': request_id,
+                'status': snapshot.stage,
+                'updated_at': snapshot.updated_at.isoformat() if snapshot.updated_at else None
+            }
+            entry.update(describe_stage(request_id, request_uuid, snapshot.stage, include_result))
+            if snapshot.stage not in AIResponse.TERMINAL_STAGES:
+                entry['estimate'] = get_request_estimate(request_uuid, snapshot)
+            statuses.append(entry)
+        
+        # Cooldown and waitlist mode are the same for every request, so they are read once
+        processor_state = waitlist.get_processor_state()
+        return jsonify({
+            'requests': statuses,
+            'cooldown_mode': processor_state['on_cooldown'],
+            'waitlist_mode': processor_state['on_waitlist'],
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting schedule statuses: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def format_sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/schedule/<request_id>/events', methods=['GET'])
+def stream_schedule_events(request_id):
+    """Stream a request's stage transitions as Server-Sent Events until it finishes"""
+    if not event_streams_enabled:
+        return jsonify({'error': 'Event streams are disabled'}), 404
+    
+    try:
+        request_uuid = uuid.UUID(request_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid request ID format'}), 400
+    
+    status = waitlist.get_status_snapshot(request_uuid)
+    if status is None:
+        return jsonify({'error': 'Request not found'}), 404
+    
+    def stage_event(status):
+        return format_sse("stage", {
+            'request_id': request_id,
+            'status': status.stage,
+            'updated_at': status.updated_at.isoformat() if status.updated_at else None,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        })
+    
+    def generate(status):
+        yield stage_event(status)
+        started = last_sent = time.time()
+        
+        while status.stage not in AIResponse.TERMINAL_STAGES:
+            if time.time() - started >= SSE_MAX_SECONDS:
+                # Closing without an end event makes EventSource reconnect
+                return
+            
+            current = waitlist.wait_for_status_change(request_uuid, status, SSE_POLL_SECONDS)
+            if current is None:
+                yield format_sse("end", {'request_id': request_id, 'status': 'not found'})
+                return
+            if current.stage != status.stage:
+                yield stage_event(current)
+                last_sent = time.time()
+            elif time.time() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.time()
+            status = current
+        
+        yield format_sse("end", {'request_id': request_id, 'status': status.stage})
+    
+    return Response(generate(status), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop nginx from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+# Timeline entry shown for each recorded stage; other stages are not shown
+TIMELINE_STAGES = {
+    'initiated': ('Request submitted', 'Your schedule request was submitted successfully'),
+    'courses_collected': ('Course data fetched', 'Course information has been retrieved from Virginia Tech'),
+    'ai_processing': ('AI processing started', 'AI is now generating your optimal schedule'),
+    'done_processing': ('Processing completed', 'Your schedule has been generated successfully')
+}
+
 def get_request_timeline(request_uuid):
-    """Get timeline of events for a request"""
+    """Get timeline of events for a request from its recorded stage transitions"""
     timeline = []
     
-    # Get logs for this request
-    log_file = os.path.join(server_folder, "server_logs.json")
-    if os.path.exists(log_file):
-        with open(log_file, 'r') as f:
-            logs = json.load(f)
-        
-        # Filter logs for this request
-        request_logs = [log for log in logs if str(request_uuid) in str(log.get('data', {}))]
-        
-        # Create timeline
-        for log in request_logs:
-            if log['event'] == 'request_submitted':
-                timeline.append({
-                    'time': log['timestamp'],
-                    'event': 'Request submitted',
-                    'description': 'Your schedule request was submitted successfully'
-                })
-            elif log['event'] == 'courses_extracted':
-                timeline.append({
-                    'time': log['timestamp'],
-                    'event': 'Course data fetched',
-                    'description': 'Course information has been retrieved from Virginia Tech'
-                })
-            elif log['event'] == 'ai_processing_started':
-                timeline.append({
-                    'time': log['timestamp'],
-                    'event': 'AI processing started',
-                    'description': 'AI is now generating your optimal schedule'
-                })
-            elif log['event'] == 'ai_processing_completed':
-                timeline.append({
-                    'time': log['timestamp'],
-                    'event': 'Processing completed',
-                    'description': 'Your schedule has been generated successfully'
-                })
+    for entry in waitlist.get_timeline(request_uuid) or []:
+        if entry['stage'] in TIMELINE_STAGES:
+            event, description = TIMELINE_STAGES[entry['stage']]
+            timeline.append({
+                'time': entry['time'],
+                'event': event,
+                'description': description
+            })
     
     return timeline
 
+@app.route('/api/requests', methods=['GET'])
+@require_auth
+def get_request_history():
+    """
+    Get a user's past requests by email, newest first, paginated by created_at
+
+    Admin only: request ids are the only credential for a schedule, so they
+    must never be handed out for an email address alone.
+    """
+    try:
+        email = request.args.get('email', '').strip()
+        if not email:
+            return jsonify({'error': 'Email is required'}), 400
+
+        # Cursor is the created_at of the last request on the previous page
+        before = request.args.get('before')
+        if before:
+            before = datetime.fromisoformat(before).isoformat()
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+
+        requests_page = waitlist.get_request_history(email, before, limit)
+
+        return jsonify({
+            'email': email,
+            'requests': requests_page,
+            'next_before': requests_page[-1]['created_at'] if len(requests_page) == limit else None
+        }), 200
+
+    except ValueError:
+        return jsonify({'error': 'Invalid before or limit parameter'}), 400
+    except Exception as e:
+        logger.error(f"Error getting request history: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/download_schedule/<request_id>', methods=['POST'])
 def download_schedule(request_id):
     """Download schedule as PDF"""
@@ -515,22 +712,35 @@ def download_schedule(request_id):
         logger.error(f"Error downloading schedule: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def build_waitlist_status():
+    """Build the overall waitlist status from the live counters"""
+    processor_state = waitlist.get_processor_state()
+    cooldown_mode = processor_state['on_cooldown']
+    waitlist_mode = processor_state['on_waitlist']
+    counts = waitlist.get_live_counts()
+    
+    return {
+        'total_requests': counts['total_requests'],
+        'ai_processing': processor_state['processing'],
+        'cooldown_mode': cooldown_mode,
+        'waitlist_mode': waitlist_mode,
+        'queue_size': counts['queued'],
+        'in_flight': counts['in_flight'],
+        'completed_last_hour': counts['completed_last_hour'],
+        'stages': counts['stages'],
+        'can_accept_requests': not (cooldown_mode or waitlist_mode),
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+
 @app.route('/api/waitlist_status', methods=['GET'])
 def get_waitlist_status():
-    """Get overall waitlist status"""
+    """Get overall waitlist status, rebuilt at most once per WAITLIST_STATUS_CACHE_SECONDS"""
     try:
-        cooldown_mode = ai_processor._should_wait_for_cooldown() if ai_processor else False
-        waitlist_mode = waitlist.on_waitlist if waitlist else False
-        
-        status = {
-            'total_requests': len(waitlist.get_waitlist()),
-            'ai_processing': waitlist.is_ai_processing(),
-            'cooldown_mode': cooldown_mode,
-            'waitlist_mode': waitlist_mode,
-            'queue_size': waitlist.get_queue_size(),
-            'can_accept_requests': not (cooldown_mode or waitlist_mode),
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        }
+        with waitlist_status_lock:
+            if time.time() - waitlist_status_cache['built_at'] >= WAITLIST_STATUS_CACHE_SECONDS:
+                waitlist_status_cache['status'] = build_waitlist_status()
+                waitlist_status_cache['built_at'] = time.time()
+            status = waitlist_status_cache['status']
         
         return jsonify(status), 200
         
@@ -538,24 +748,39 @@ def get_waitlist_status():
         logger.error(f"Error getting waitlist status: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def parse_log_time(value):
+    """Parse an ISO timestamp query parameter, treating naive times as UTC"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
 @app.route('/api/logs', methods=['GET'])
 @require_auth
 def get_logs():
-    """Get waitlist logs - Admin access required"""
+    """
+    Get waitlist logs, newest page first - Admin access required
+    
+    Query parameters: limit (default 100, max 1000), cursor (next_cursor of the
+    previous page), event (comma separated), request_id, since, until (ISO times)
+    """
     try:
-        log_file = os.path.join(server_folder, "server_logs.json")
-        
-        if not os.path.exists(log_file):
-            return jsonify({'logs': []}), 200
-        
-        with open(log_file, 'r') as f:
-            logs = json.load(f)
-        
-        # Return last 100 entries
-        logs = logs[-100:] if len(logs) > 100 else logs
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+        events = request.args.get('event')
+        
+        page = waitlist.event_log.query(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            events=set(events.split(',')) if events else None,
+            request_id=request.args.get('request_id'),
+            since=parse_log_time(request.args.get('since')),
+            until=parse_log_time(request.args.get('until'))
+        )
         
-        return jsonify({'logs': logs}), 200
+        return jsonify(page), 200
         
+    except ValueError:
+        return jsonify({'error': 'Invalid limit, cursor or time parameter'}), 400
     except Exception as e:
         logger.error(f"Error getting logs: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -569,11 +794,45 @@ def admin_status():
         'timestamp': datetime.now(timezone.utc).isoformat(),
         'waitlist_initialized': waitlist is not None,
         'ai_processor_initialized': ai_processor is not None,
+        'ai_processor_leader': waitlist.is_leader if waitlist else False,
+        'event_log': waitlist.event_log.get_stats() if waitlist else None,
         'admin_credentials_loaded': admin_credentials is not None,
         'server_folder': server_folder,
         'config_file': config_file
     }), 200
 
+@app.route('/api/admin/memory', methods=['GET'])
+@require_auth
+def admin_memory():
+    """Admin-only endpoint reporting memory use of the request cache per stage"""
+    try:
+        if not waitlist:
+            return jsonify({'error': 'Server not initialized'}), 503
+        
+        return jsonify(waitlist.get_memory_report()), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting memory report: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/admin/debug/<request_id>', methods=['GET'])
+@require_auth
+def admin_debug_capture(request_id):
+    """Admin-only endpoint returning the captured AI attempts for one request"""
+    try:
+        request_uuid = uuid.UUID(request_id)
+        persist = request.args.get('persist', '').lower() in ('1', 'true', 'yes')
+        
+        attempts = waitlist.get_debug_attempts(request_uuid, persist)
+        
+        return jsonify({'request_id': request_id, 'attempts': attempts}), 200
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid request ID format'}), 400
+    except Exception as e:
+        logger.error(f"Error getting debug capture: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -0,0 +1,88 @@
+"""
+Benchmark WaitList.save() latency with dirty tracking against a full re-encode
+
+Usage:
+    python bench_waitlist_save.py [record counts...]
+
+Each run builds a snapshot-mode WaitList holding N finished requests, changes
+one of them and times save(). The "full" column is what every save cost
+before dirty tracking: calling to_dict() on every record and encoding the
+whole list.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+from uuid import uuid4
+from datetime import datetime
+from WaitList import WaitList
+
+
+def build_record(course_ref):
+    """Build a stored finished request referencing a shared timetable"""
+    now = datetime.now().isoformat()
+    return {
+        "id": str(uuid4()),
+        "courses_requested": [{"department": "CS", "number": "2114"}],
+        "semester": "202501",
+        "email": "student@vt.edu",
+        "stage": "done_processing",
+        "course_timetable": {"CS2114": {"ref": course_ref}},
+        "ai_response": {"classes": [{
+            "crn": "12345", "courseNumber": "CS2114", "courseName": "Software Design & Data Structures",
+            "days": "MWF", "time": "9:05AM - 9:55AM", "location": "MCB 100", "isLab": False
+        }]},
+        "preferences": "No classes before 9am",
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def time_call(func, repeat=5):
+    """Return the best wall time of several calls in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(count):
+    """Time full and incremental saves for a waitlist of the given size"""
+    server_folder = tempfile.mkdtemp(prefix="bench_waitlist_")
+    try:
+        with open(os.path.join(server_folder, "user_data.json"), "w") as f:
+            json.dump([build_record("202501/CS2114/benchmark") for _ in range(count)], f)
+
+        waitlist = WaitList(server_folder, {"api_keys": ["benchmark"], "model": "benchmark"})
+        waitlist.stop_ai_processor()
+
+        def full_save():
+            with open(os.path.join(server_folder, "user_data.json"), "w") as f:
+                json.dump([r.to_dict() for r in waitlist.waitlist], f)
+
+        # First save populates the per-record cache
+        waitlist.save()
+        changed = waitlist.waitlist[count // 2]
+
+        def incremental_save():
+            changed.update_stage("done_processing")
+
+        full_ms = time_call(full_save)
+        incremental_ms = time_call(incremental_save)
+        return full_ms, incremental_ms
+    finally:
+        shutil.rmtree(server_folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    results = [(count,) + run(count) for count in counts]
+
+    print(f"{'records':>10} {'full (ms)':>12} {'dirty-only (ms)':>16} {'speedup':>9}")
+    for count, full_ms, incremental_ms in results:
+        print(f"{count:>10} {full_ms:>12.1f} {incremental_ms:>16.1f} {full_ms / incremental_ms:>8.1f}x")
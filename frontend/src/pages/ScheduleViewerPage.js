@@ -17,6 +17,9 @@ import toast from "react-hot-toast";
 const API_HOST =
   process.env.REACT_APP_API_HOST || "http://localhost:8000";
 
+// Statuses after which a request no longer changes
+const FINISHED_STATUSES = ["done_processing", "ai_failed", "extraction_failed"];
+
 const ScheduleViewerPage = () => {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -31,22 +34,56 @@ const ScheduleViewerPage = () => {
   const [waitlistMode, setWaitlistMode] = useState(false);
   const [isProcessing, setIsProcessing] = useState(true);
   const pollingIntervalRef = useRef(null);
+  const pollDelayRef = useRef(3000);
+  const eventSourceRef = useRef(null);
   const [isRefreshing, setIsRefreshing] = useState(false);
 
   useEffect(() => {
     if (id) {
-      checkScheduleStatus();
-      // Set up polling for status updates
-      const interval = setInterval(checkScheduleStatus, 3000);
-      pollingIntervalRef.current = interval;
-      
+      let cancelled = false;
+
+      checkScheduleStatus().then((data) => {
+        if (cancelled || !data || FINISHED_STATUSES.includes(data.status)) {
+          return;
+        }
+        // The server only offers a progress stream when its workers can hold one open;
+        // browsers without Server-Sent Events fall back to polling as well
+        if (data.events_url && typeof window.EventSource !== "undefined") {
+          openEventStream(data.events_url);
+        } else {
+          startPolling();
+        }
+      });
+
       return () => {
-        clearInterval(interval);
-        pollingIntervalRef.current = null;
+        cancelled = true;
+        if (eventSourceRef.current) {
+          eventSourceRef.current.close();
+          eventSourceRef.current = null;
+        }
+        stopPolling();
       };
     }
   }, [id]);
 
+  const openEventStream = (eventsUrl) => {
+    // Refresh the status whenever the server reports a stage transition
+    const source = new EventSource(`${API_HOST}${eventsUrl}`);
+    eventSourceRef.current = source;
+    source.addEventListener("stage", () => checkScheduleStatus());
+    source.addEventListener("end", () => {
+      source.close();
+      eventSourceRef.current = null;
+    });
+    source.onerror = () => {
+      // EventSource reconnects on its own unless the connection was refused outright
+      if (source.readyState === window.EventSource.CLOSED) {
+        eventSourceRef.current = null;
+        startPolling();
+      }
+    };
+  };
+
   const checkScheduleStatus = async () => {
     try {
       const response = await fetch(`${API_HOST}/api/schedule/${id}`);
@@ -68,9 +105,12 @@ const ScheduleViewerPage = () => {
       setTimeline(data.timeline || []);
       setCooldownMode(data.cooldown_mode || false);
       setWaitlistMode(data.waitlist_mode || false);
+      if (data.estimate && data.estimate.poll_after_seconds) {
+        pollDelayRef.current = data.estimate.poll_after_seconds * 1000;
+      }
 
       // Check if processing is complete
-      const isComplete = data.status === "done_processing" || data.status === "ai_failed" || data.status === "extraction_failed";
+      const isComplete = FINISHED_STATUSES.includes(data.status);
       
       console.log('Schedule status:', data.status, 'isComplete:', isComplete, 'pollingInterval:', pollingIntervalRef.current);
       
@@ -78,6 +118,10 @@ const ScheduleViewerPage = () => {
         setLoading(false);
         setIsProcessing(false);
         stopPolling(); // Stop continuous polling
+        if (eventSourceRef.current) {
+          eventSourceRef.current.close();
+          eventSourceRef.current = null;
+        }
         if (data.schedule && data.schedule.classes) {
           generateColors(data.schedule);
         }
@@ -85,6 +129,7 @@ const ScheduleViewerPage = () => {
         setLoading(true);
         setIsProcessing(true);
       }
+      return data;
 
     } catch (error) {
       console.error("Error checking schedule status:", error);
@@ -97,7 +142,7 @@ const ScheduleViewerPage = () => {
 
   const stopPolling = () => {
     if (pollingIntervalRef.current) {
-      clearInterval(pollingIntervalRef.current);
+      clearTimeout(pollingIntervalRef.current);
       pollingIntervalRef.current = null;
       console.log('Polling stopped - AI processing complete');
     }
@@ -105,8 +150,16 @@ const ScheduleViewerPage = () => {
 
   const startPolling = () => {
     if (!pollingIntervalRef.current) {
-      const interval = setInterval(checkScheduleStatus, 3000);
-      pollingIntervalRef.current = interval;
+      // Wait as long as the server suggests from the request's predicted completion
+      const poll = () => {
+        pollingIntervalRef.current = setTimeout(async () => {
+          await checkScheduleStatus();
+          if (pollingIntervalRef.current) {
+            poll();
+          }
+        }, pollDelayRef.current);
+      };
+      poll();
     }
   };
 
@@ -275,6 +328,20 @@ const ScheduleViewerPage = () => {
                     style={{ width: `${progress.percentage}%` }}
                   ></div>
                 </div>
+                {scheduleData?.estimate && (scheduleData.estimate.queue_position || scheduleData.estimate.eta_seconds !== null) && (
+                  <div className="flex justify-between text-sm text-gray-500 dark:text-gray-400 mt-2">
+                    <span>
+                      {scheduleData.estimate.queue_position
+                        ? `Position ${scheduleData.estimate.queue_position} in queue`
+                        : ""}
+                    </span>
+                    <span>
+                      {scheduleData.estimate.eta_seconds !== null
+                        ? `About ${Math.max(1, Math.round(scheduleData.estimate.eta_seconds / 60))} min remaining`
+                        : ""}
+                    </span>
+                  </div>
+                )}
               </div>
 
               {(cooldownMode || waitlistMode) && (
@@ -443,6 +443,14 @@ const SchedulerPage = () => {
               </div>
             </div>
           )}
+          {waitlistStatus && waitlistStatus.can_accept_requests &&
+            waitlistStatus.queue_size + waitlistStatus.in_flight > 0 && (
+            <p className="mt-4 text-sm text-gray-500 dark:text-gray-400">
+              {waitlistStatus.queue_size + waitlistStatus.in_flight} schedule
+              {waitlistStatus.queue_size + waitlistStatus.in_flight === 1 ? " is" : "s are"} being
+              generated right now
+            </p>
+          )}
         </div>
 
         {/* History Section */}